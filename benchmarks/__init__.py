@@ -0,0 +1,30 @@
+#!/usr/bin/env python
+# encoding=utf8 ---------------------------------------------------------------
+# Project           : smalldoc
+# -----------------------------------------------------------------------------
+# Author            : FFunction
+# License           : BSD License
+# -----------------------------------------------------------------------------
+# Creation date     : 2016-12-22
+# Last modification : 2016-12-22
+# -----------------------------------------------------------------------------
+
+import os, sys
+
+__doc__ = """
+Performance benchmarks for smalldoc. Run all the stages with
+
+    python -m benchmarks [-s SIZE] [-r REPEAT] [-o results.jsonl]
+
+see `benchmarks.stages` for the list of stages and `benchmarks.synthetic`
+for the generated models and sources. The memory used by the model is
+measured separately by `benchmarks/memory.py`, and the start-up time
+budget of the command line tool is checked by `benchmarks/startup.py`.
+"""
+
+# The benchmarks run against the source tree
+SOURCES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+if SOURCES not in sys.path:
+	sys.path.insert(0, SOURCES)
+
+# EOF - vim: ts=4 sw=4 noet
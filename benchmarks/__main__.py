@@ -0,0 +1,2 @@
+from benchmarks.stages import main
+main()
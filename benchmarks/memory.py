@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+# encoding=utf8 ---------------------------------------------------------------
+# Project           : smalldoc
+# -----------------------------------------------------------------------------
+# Author            : FFunction
+# License           : BSD License
+# -----------------------------------------------------------------------------
+# Creation date     : 2016-12-22
+# Last modification : 2016-12-22
+# -----------------------------------------------------------------------------
+
+from __future__ import print_function
+
+import os, sys, gc, json, tracemalloc
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+from smalldoc.model import *
+
+__doc__ = """
+Measures the memory used by a synthetic model of the given number of
+elements (1M by default), comparing `Element` with the previous,
+dict-based representation that eagerly allocated its lists, and with
+the elements created by a `Documenter`, which relations are stored in
+its `Edges` table.
+
+Usage: python benchmarks/memory.py [COUNT]
+"""
+
+class LegacyElement(object):
+	"""The element representation before `__slots__` and lazy lists,
+	kept here as a baseline."""
+
+	def __init__( self, id=None, name=None, type=None, parent=None, tags=None, documentation=None, representation=None, source=None, range=None ):
+		self.id             = id
+		self.name           = name
+		self.type           = type
+		self.tags           = tags
+		self.parent         = parent
+		self.documentation  = documentation
+		self.representation = representation
+		self.source         = source
+		self.range          = range
+		self.children       = []
+		self.relations      = []
+
+	def addRelation( self, verb, *objects ):
+		self.relations.append([verb] + list(objects))
+		return self
+
+	def setSlot( self, name, value ):
+		self.children.append((name, value))
+		if value:
+			value.addRelation(REL_DEFINED, self)
+			value.addRelation(REL_SLOT, name, value)
+		return self
+
+def build( factory, count ):
+	"""Builds a model of `count` elements with the given element factory,
+	shaped like a Sugar module: modules of 100 classes with 9 methods
+	each, and most methods holding a documentation-less value leaf
+	without children."""
+	roots = []
+	made  = 0
+	while made < count:
+		module = factory(id="m{0}".format(len(roots)), type=KEY_MODULE)
+		made  += 1
+		for c in range(100):
+			if made >= count: break
+			klass = factory(id="{0}.C{1}".format(module.id, c), type=KEY_CLASS)
+			module.setSlot(klass.id, klass)
+			made += 1
+			for m in range(9):
+				if made >= count: break
+				value = factory(id="{0}.v{1}".format(klass.id, m), type=KEY_VALUE, representation="None")
+				klass.setSlot(value.id, value)
+				made += 1
+		roots.append(module)
+	return roots
+
+def measure( factory, count ):
+	"""Returns the number of bytes held by the model once it is built."""
+	gc.collect()
+	tracemalloc.start()
+	roots = build(factory, count)
+	current, _ = tracemalloc.get_traced_memory()
+	tracemalloc.stop()
+	del roots
+	return current
+
+if __name__ == "__main__":
+	count  = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+	legacy = measure(LegacyElement, count)
+	slots  = measure(Element, count)
+	edges  = measure(Documenter().createElement, count)
+	print(json.dumps({
+		"elements"         : count,
+		"legacy_bytes"     : legacy,
+		"element_bytes"    : slots,
+		"edges_bytes"      : edges,
+		"bytes_per_element": [legacy // count, slots // count, edges // count],
+		"reduction"        : round(1.0 - float(slots) / legacy, 3),
+		"edges_reduction"  : round(1.0 - float(edges) / legacy, 3),
+	}, indent=1))
+
+# EOF - vim: ts=4 sw=4 noet
@@ -0,0 +1,178 @@
+#!/usr/bin/env python
+# encoding=utf8 ---------------------------------------------------------------
+# Project           : smalldoc
+# -----------------------------------------------------------------------------
+# Author            : FFunction
+# License           : BSD License
+# -----------------------------------------------------------------------------
+# Creation date     : 2016-12-22
+# Last modification : 2016-12-22
+# -----------------------------------------------------------------------------
+
+import os, io, sys, json, time, platform, tempfile, shutil
+import benchmarks
+from   benchmarks       import synthetic
+from   smalldoc.model   import Documenter
+from   smalldoc.drivers import Driver
+
+__doc__ = """
+Times each stage of a documentation build separately (driver parse, model
+construction, `toJSON`, each output format and `Driver.unindent`) and
+records the results as JSON lines, so that runs can be compared over time.
+"""
+
+# The list of `(name, prepare)` stages, where `prepare(size)` returns the
+# function to time. That function can have a `cleanup` attribute, which is
+# called once the stage has been measured.
+STAGES = []
+
+class Skip(Exception):
+	"""Raised by a stage that cannot run in this environment."""
+
+def stage( name ):
+	def decorator( prepare ):
+		STAGES.append((name, prepare))
+		return prepare
+	return decorator
+
+# -----------------------------------------------------------------------------
+#
+# STAGES
+#
+# -----------------------------------------------------------------------------
+
+@stage("model")
+def prepareModel( size ):
+	return lambda: synthetic.model(size)
+
+@stage("toJSON")
+def prepareToJSON( size ):
+	return synthetic.model(size).toJSON
+
+def prepareWrite( format ):
+	def prepare( size ):
+		documenter = synthetic.model(size)
+		return lambda: documenter.write(io.StringIO(), format)
+	return prepare
+
+stage("write:json")(prepareWrite("json"))
+stage("write:compact")(prepareWrite("compact"))
+stage("write:html")(prepareWrite("html"))
+stage("write:js")(prepareWrite("js"))
+
+@stage("write:split")
+def prepareSplit( size ):
+	documenter = synthetic.model(size)
+	def write():
+		path = tempfile.mkdtemp(prefix="smalldoc-bench-")
+		try:
+			documenter.writeSplit(path)
+		finally:
+			shutil.rmtree(path)
+	return write
+
+def prepareUnindent( **options ):
+	def prepare( size ):
+		driver = Driver(Documenter())
+		text   = synthetic.source(size, **options)
+		return lambda: driver.unindent(text)
+	return prepare
+
+stage("unindent:tabs")(prepareUnindent(tabs=True))
+stage("unindent:spaces")(prepareUnindent(tabs=False))
+stage("unindent:mixed")(prepareUnindent(mixed=True))
+
+def prepareParse( driver, extension, generate ):
+	def prepare( size ):
+		try:
+			import smalldoc.main
+			smalldoc.main.create_driver(driver, Documenter())
+		except (ImportError, SyntaxError) as e:
+			raise Skip("Driver `{0}` is not available: {1}".format(driver, e))
+		fd, path = tempfile.mkstemp(suffix="." + extension)
+		with os.fdopen(fd, "w") as f:
+			f.write(generate(max(1, size // 10)))
+		def parse():
+			smalldoc.main.create_driver(driver, Documenter()).parse(path)
+		parse.cleanup = lambda: os.unlink(path)
+		return parse
+	return prepare
+
+stage("parse:texto")(prepareParse("texto", "txto", synthetic.texto))
+stage("parse:sugar")(prepareParse("sugar", "sjs",  synthetic.sugar))
+stage("parse:python")(prepareParse("python", "py", synthetic.python))
+
+# -----------------------------------------------------------------------------
+#
+# RUNNER
+#
+# -----------------------------------------------------------------------------
+
+def measure( function, repeat=5 ):
+	"""Returns the timings of `repeat` calls of the given function."""
+	timings = []
+	for _ in range(repeat):
+		start = time.perf_counter()
+		function()
+		timings.append(time.perf_counter() - start)
+	return {
+		"best"   : min(timings),
+		"mean"   : sum(timings) / len(timings),
+		"repeat" : repeat,
+	}
+
+def version():
+	try:
+		import smalldoc.main
+		return smalldoc.main.__version__
+	except ImportError as e:
+		return None
+
+def run( size=1000, repeat=5, only=None, log=sys.stderr ):
+	"""Runs the stages (or only the ones which name starts with one of the
+	given prefixes) and returns the result record."""
+	results = {}
+	for name, prepare in STAGES:
+		if only and not any(name.startswith(_) for _ in only):
+			continue
+		try:
+			function = prepare(size)
+		except Skip as e:
+			results[name] = {"skipped":str(e)}
+		else:
+			try:
+				results[name] = measure(function, repeat)
+			finally:
+				if hasattr(function, "cleanup"):
+					function.cleanup()
+		if log:
+			r = results[name]
+			log.write("{0:16s} {1}\n".format(name, "{0:.6f}s".format(r["best"]) if "best" in r else r["skipped"]))
+	return {
+		"timestamp" : time.strftime("%Y-%m-%dT%H:%M:%S"),
+		"version"   : version(),
+		"python"    : platform.python_version(),
+		"size"      : size,
+		"stages"    : results,
+	}
+
+def main( args=None ):
+	from optparse import OptionParser
+	oparser = OptionParser(prog="benchmarks")
+	oparser.add_option("-s", "--size", dest="size", type="int", default=1000,
+		help="Number of elements of the synthetic models (and lines of sources)")
+	oparser.add_option("-r", "--repeat", dest="repeat", type="int", default=5,
+		help="Number of timed runs per stage")
+	oparser.add_option("-o", "--output", dest="output",
+		help="Appends the results as a JSON line to the given file")
+	options, only = oparser.parse_args(args=args)
+	record = run(options.size, options.repeat, only)
+	if options.output:
+		with open(options.output, "a") as f:
+			f.write(json.dumps(record, sort_keys=True) + "\n")
+	else:
+		json.dump(record, sys.stdout, indent=1, sort_keys=True)
+		sys.stdout.write("\n")
+	return record
+
+# EOF - vim: ts=4 sw=4 noet
@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+# encoding=utf8 ---------------------------------------------------------------
+# Project           : smalldoc
+# -----------------------------------------------------------------------------
+# Author            : FFunction
+# License           : BSD License
+# -----------------------------------------------------------------------------
+# Creation date     : 2016-12-22
+# Last modification : 2016-12-22
+# -----------------------------------------------------------------------------
+
+from __future__ import print_function
+
+import os, re, sys, json, subprocess
+
+__doc__ = """
+Checks the start-up cost of the command line tool: imports `smalldoc.main`
+with `python -X importtime` and fails (exit status 1) when the import
+takes longer than the budget (in milliseconds, 60 by default) or when
+it imports a driver or one of their third-party dependencies, which must
+only be imported when first used.
+
+Usage: python benchmarks/startup.py [BUDGET_MS] [REPEAT]
+"""
+
+SOURCES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+
+# The modules that must not be imported at start-up
+DEFERRED = (
+	"lambdafactory", "texto", "sugar", "sugar2",
+	"smalldoc.drivers.sg", "smalldoc.drivers.py", "smalldoc.drivers.txto",
+	"smalldoc.server", "smalldoc.search", "smalldoc.watch",
+)
+
+RE_IMPORT_TIME = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)\s*$")
+
+def measure( module="smalldoc.main" ):
+	"""Returns the cumulative import time of the given module in seconds,
+	and the `{module:(self, cumulative)}` import times of all the
+	modules imported along with it."""
+	env = dict(os.environ, PYTHONPATH=os.pathsep.join([SOURCES] + [_ for _ in [os.environ.get("PYTHONPATH")] if _]))
+	out = subprocess.run(
+		[sys.executable, "-X", "importtime", "-c", "import " + module],
+		env=env, stderr=subprocess.PIPE, stdout=subprocess.DEVNULL, universal_newlines=True,
+	)
+	modules = {}
+	for line in out.stderr.split("\n"):
+		m = RE_IMPORT_TIME.match(line)
+		if m:
+			modules[m.group(4)] = (int(m.group(1)) / 1e6, int(m.group(2)) / 1e6)
+	if out.returncode != 0 or module not in modules:
+		raise RuntimeError("Cannot import `{0}`: {1}".format(module, out.stderr.strip().split("\n")[-1]))
+	return modules[module][1], modules
+
+if __name__ == "__main__":
+	budget  = float(sys.argv[1]) / 1000 if len(sys.argv) > 1 else 0.060
+	repeat  = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+	# We keep the fastest run, the others being noise from the system
+	runs    = [measure() for _ in range(repeat)]
+	total, modules = min(runs, key=lambda _:_[0])
+	eager   = sorted(_ for _ in modules if any(_ == d or _.startswith(d + ".") for d in DEFERRED))
+	slowest = sorted(modules.items(), key=lambda _:-_[1][0])[:10]
+	print(json.dumps({
+		"import_ms" : round(total * 1000, 3),
+		"budget_ms" : round(budget * 1000, 3),
+		"modules"   : len(modules),
+		"eager"     : eager,
+		"slowest"   : [[name, round(t[0] * 1000, 3)] for name, t in slowest],
+	}, indent=1))
+	sys.exit(1 if total > budget or eager else 0)
+
+# EOF - vim: ts=4 sw=4 noet
@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+# encoding=utf8 ---------------------------------------------------------------
+# Project           : smalldoc
+# -----------------------------------------------------------------------------
+# Author            : FFunction
+# License           : BSD License
+# -----------------------------------------------------------------------------
+# Creation date     : 2016-12-22
+# Last modification : 2016-12-22
+# -----------------------------------------------------------------------------
+
+import random
+import benchmarks
+from   smalldoc.model import *
+
+__doc__ = """
+Generates synthetic models and sources of configurable size. Generation is
+seeded, so that the same size always produces the same data.
+"""
+
+WORDS = (
+	"returns the given element value list map name path module class method "
+	"attribute source document section parent child relation index type tag "
+	"self none true false string number reference option default parser"
+).split()
+
+def sentence( rng, count=12 ):
+	return " ".join(rng.choice(WORDS) for _ in range(count)).capitalize() + "."
+
+def model( size=1000, seed=0 ):
+	"""Returns a documenter with about `size` elements, shaped like a
+	Sugar program: modules of classes with documented methods, some of
+	which share the same boilerplate documentation."""
+	rng        = random.Random(seed)
+	documenter = Documenter()
+	count      = 0
+	m          = 0
+	while count < size:
+		module = documenter.createModule(name="module{0}".format(m), id="module{0}".format(m), documentation="<p>" + sentence(rng) + "</p>")
+		count += 1
+		for c in range(10):
+			if count >= size: break
+			klass = documenter.createClass(name="Class{0}".format(c), id="{0}.Class{1}".format(module.id, c), tags=[], documentation="<p>" + sentence(rng, 30) + "</p>")
+			klass.addRelation(REL_PARENT, "Class{0}".format(c - 1) if c else "Object")
+			module.setSlot(klass.name, klass)
+			count += 1
+			for f in range(20):
+				if count >= size: break
+				doc      = "<p>Returns self</p>" if f % 3 == 0 else "<p>" + sentence(rng, 20) + "</p>"
+				function = documenter.createFunction(name="method{0}".format(f), id="{0}.method{1}".format(klass.id, f), tags=[KEY_METHOD], documentation=doc)
+				function.addRelation(REL_ARGUMENTS, ["a", "b:String", "c=None"])
+				function.addRelation(REL_SOURCE, module.id + ".sjs", [f * 100, f * 100 + 80])
+				function.representation = "<span class='name'>{0}</span>".format(function.name)
+				klass.setSlot(function.name, function)
+				count += 1
+		documenter.addElement(module)
+		m += 1
+	return documenter
+
+def texto( size=100, seed=0 ):
+	"""Returns a Texto document with `size` sections."""
+	rng   = random.Random(seed)
+	lines = ["Synthetic document", "==================", ""]
+	for i in range(size):
+		title = "Section {0}".format(i)
+		lines += [title, "-" * len(title), ""]
+		for p in range(3):
+			lines += [sentence(rng, 40), ""]
+		lines += ["  - " + sentence(rng), "  - " + sentence(rng), ""]
+	return "\n".join(lines)
+
+def sugar( size=100, seed=0 ):
+	"""Returns a Sugar module with `size` classes of ten methods each."""
+	rng   = random.Random(seed)
+	lines = ["@module synthetic", "| " + sentence(rng), ""]
+	for c in range(size):
+		lines += ["@class Class{0}{1}".format(c, ": Class{0}".format(c - 1) if c else ""), "| " + sentence(rng, 30), ""]
+		lines += ["\t@property value{0}:Number = {0}".format(c), ""]
+		for m in range(10):
+			lines += [
+				"\t@method method{0} a, b:String, c=None".format(m),
+				"\t| " + ("Returns self" if m % 3 == 0 else sentence(rng, 20)),
+				"\t\tlet v = a + b",
+				"\t\tif c",
+				"\t\t\treturn v",
+				"\t\tend",
+				"\t\treturn self",
+				"\t@end",
+				"",
+			]
+		lines += ["@end", ""]
+	return "\n".join(lines)
+
+def python( size=100, seed=0 ):
+	"""Returns a Python module with `size` classes of ten methods each."""
+	rng   = random.Random(seed)
+	lines = ['"""' + sentence(rng) + '"""', "", "import os", ""]
+	for c in range(size):
+		lines += ["class Class{0}({1}):".format(c, "Class{0}".format(c - 1) if c else "object"), '\t"""' + sentence(rng, 30) + '"""', ""]
+		lines += ["\tVALUE{0} = {0}".format(c), ""]
+		for m in range(10):
+			lines += [
+				"\tdef method{0}( self, a, b, c=None ):".format(m),
+				'\t\t"""' + ("Returns self" if m % 3 == 0 else sentence(rng, 20)) + '"""',
+				"\t\tv = a + b",
+				"\t\tif c:",
+				"\t\t\treturn v",
+				"\t\treturn self",
+				"",
+			]
+	return "\n".join(lines)
+
+def source( lines=1000, seed=0, tabs=True, mixed=False ):
+	"""Returns an indented source code of the given number of lines, as
+	given to `Driver.unindent` for value representations. Mixed sources
+	alternate tab and space indentation."""
+	rng    = random.Random(seed)
+	res    = []
+	for i in range(lines):
+		indent = "\t\t" if tabs and not (mixed and i % 2) else "        "
+		res.append(indent + "\t" * (i % 3) + sentence(rng, 8))
+	return "\n".join(res)
+
+# EOF - vim: ts=4 sw=4 noet
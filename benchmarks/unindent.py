@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+# encoding=utf8 ---------------------------------------------------------------
+# Project           : smalldoc
+# -----------------------------------------------------------------------------
+# Author            : FFunction
+# License           : BSD License
+# -----------------------------------------------------------------------------
+# Creation date     : 2016-12-22
+# Last modification : 2016-12-22
+# -----------------------------------------------------------------------------
+
+from __future__ import print_function
+
+import os, re, sys, json, timeit
+from   functools import reduce
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from   benchmarks       import synthetic
+from   smalldoc.model   import Documenter
+from   smalldoc.drivers import Driver
+
+__doc__ = """
+Compares `Driver.unindent` with the previous implementation on large
+sources (100k lines by default).
+
+Usage: python benchmarks/unindent.py [LINES]
+"""
+
+RE_INDENT = re.compile("^([\\t ]*)")
+
+class LegacyDriver(Driver):
+	"""The implementation of `unindent` before the single-pass dedent,
+	kept here as a baseline."""
+
+	def _getLineIndent( self, line, match=None ):
+		return (match or RE_INDENT.match(line)).group().replace("\t", " ")
+
+	def _getLinesIndent( self, lines ):
+		indent = [len(self._getLineIndent(_)) for _ in lines]
+		if   len(indent) == 0:
+			return 0
+		elif len(indent) == 1:
+			return indent[0]
+		else:
+			return reduce(min, indent[1:])
+
+	def _reindentLine( self, line, delta ):
+		# The original loop never advanced, this bounds it to the indent
+		indent = RE_INDENT.match(line).group()
+		i      = 0
+		while delta > 0 and i < len(indent):
+			if indent[i] == '\t':
+				delta -= 4
+			else:
+				delta -= 1
+			i += 1
+		return line[i:]
+
+	def unindent( self, text ):
+		lines  = text.split("\n")
+		indent = self._getLinesIndent(lines)
+		return "\n".join(self._reindentLine(_, indent) for _ in lines)
+
+if __name__ == "__main__":
+	lines   = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+	results = {"lines":lines}
+	for name, options in (("tabs", dict(tabs=True)), ("spaces", dict(tabs=False)), ("mixed", dict(mixed=True))):
+		text = synthetic.source(lines, **options)
+		for label, driver in (("legacy", LegacyDriver(Documenter())), ("current", Driver(Documenter()))):
+			results["{0}:{1}".format(name, label)] = min(timeit.repeat(lambda: driver.unindent(text), number=1, repeat=5))
+	print(json.dumps(results, indent=1, sort_keys=True))
+
+# EOF - vim: ts=4 sw=4 noet
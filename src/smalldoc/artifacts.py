@@ -0,0 +1,168 @@
+#!/usr/bin/env python
+# encoding=utf8 ---------------------------------------------------------------
+# Project           : smalldoc
+# -----------------------------------------------------------------------------
+# Author            : FFunction
+# License           : BSD License
+# -----------------------------------------------------------------------------
+# Creation date     : 2016-12-22
+# Last modification : 2016-12-22
+# -----------------------------------------------------------------------------
+
+import os, json, zlib, hashlib
+
+try:
+	import zstandard
+except ImportError as e:
+	zstandard = None
+
+try:
+	import brotli
+except ImportError as e:
+	brotli = None
+
+__doc__ = """
+Writes the output files along with their precompressed siblings (`.gz`, and
+`.zst` or `.br` when the `zstandard` or `brotli` modules are available),
+compressing the data as it is written. Files can be given content-hashed
+names, so that unchanged outputs keep the same name (and cache key)
+between builds, the names being listed in a manifest.
+"""
+
+# The extensions of the supported compressed siblings
+COMPRESSIONS = ("gz", "zst", "br")
+
+class Compressor(object):
+	"""Wraps the streaming compressors of the different modules behind a
+	`compress(data)`/`flush()` interface."""
+
+	def __init__( self, compress, flush ):
+		self.compress = compress
+		self.flush    = flush
+
+def getCompressor( name ):
+	"""Returns a new `Compressor` for the given extension, or `None` when
+	the module it requires is not available."""
+	if name == "gz":
+		# The zlib gzip header has no timestamp, which keeps the output
+		# identical between builds.
+		c = zlib.compressobj(9, zlib.DEFLATED, 31)
+		return Compressor(c.compress, c.flush)
+	elif name == "zst" and zstandard:
+		c = zstandard.ZstdCompressor(level=19).compressobj()
+		return Compressor(c.compress, c.flush)
+	elif name == "br" and brotli:
+		c = brotli.Compressor()
+		return Compressor(c.process, c.finish)
+	else:
+		return None
+
+def getAvailableCompressions():
+	"""Returns the extensions of the compressions that are available."""
+	return [_ for _ in COMPRESSIONS if getCompressor(_)]
+
+class Artifact(object):
+	"""A text stream that writes the given `path` and, as the data is
+	written, its compressed siblings for each of the `compress`
+	extensions, while computing the SHA-256 of the content. When
+	`hashed`, the files are written to temporary files and renamed on
+	`close` to include the beginning of the hash, like `api.<hash>.html`.
+	Compressions which module is not available are skipped."""
+
+	def __init__( self, path, compress=(), hashed=False, encoding="utf8" ):
+		self.path        = path
+		self.hashed      = hashed
+		self.encoding    = encoding
+		self.hash        = hashlib.sha256()
+		self.size        = 0
+		self.compressed  = {}
+		self.files       = []
+		self.compressors = []
+		self.file        = self._open("")
+		for ext in compress:
+			c = getCompressor(ext)
+			if c:
+				self.compressors.append((ext, c, self._open("." + ext)))
+
+	def write( self, text ):
+		data       = text.encode(self.encoding)
+		self.size += len(data)
+		self.hash.update(data)
+		self.file.write(data)
+		for ext, c, f in self.compressors:
+			chunk = c.compress(data)
+			if chunk:
+				f.write(chunk)
+		return len(text)
+
+	def close( self ):
+		"""Flushes the compressors and closes (and renames, when hashed) the
+		files. Returns the final path."""
+		for ext, c, f in self.compressors:
+			f.write(c.flush())
+		for f, temp, suffix in self.files:
+			f.close()
+		if self.hashed:
+			base, ext = os.path.splitext(self.path)
+			self.path = "{0}.{1}{2}".format(base, self.hash.hexdigest()[:12], ext)
+		for f, temp, suffix in self.files:
+			path = self.path + suffix
+			if temp != path:
+				os.replace(temp, path)
+			if suffix:
+				self.compressed[suffix[1:]] = [path, os.path.getsize(path)]
+		return self.path
+
+	def abort( self ):
+		"""Closes the files, removing the temporary ones."""
+		for f, temp, suffix in self.files:
+			f.close()
+			if self.hashed and os.path.exists(temp):
+				os.unlink(temp)
+
+	def toJSON( self ):
+		return {
+			"path"       : self.path,
+			"sha256"     : self.hash.hexdigest(),
+			"size"       : self.size,
+			"compressed" : self.compressed,
+		}
+
+	def _open( self, suffix ):
+		"""Opens the file with the given suffix, which is a temporary file
+		when hashed, as the final name is only known once written."""
+		path = self.path + suffix
+		temp = "{0}.{1}-{2}.tmp".format(path, os.getpid(), id(self)) if self.hashed else path
+		f    = open(temp, "wb")
+		self.files.append((f, temp, suffix))
+		return f
+
+	def __enter__( self ):
+		return self
+
+	def __exit__( self, type, value, traceback ):
+		if type is None:
+			self.close()
+		else:
+			self.abort()
+		return False
+
+def writeManifest( path, artifacts ):
+	"""Writes the manifest of the given `{path:Artifact}`. Outputs are
+	listed by their path relative to the manifest, so that files with the
+	same name in different directories are kept apart, along with their
+	(hashed) path, content hash, size and compressed siblings."""
+	base = os.path.dirname(os.path.abspath(path))
+	def relative( p ):
+		return os.path.relpath(os.path.abspath(p), base)
+	res = {}
+	for name, artifact in artifacts.items():
+		a = artifact.toJSON()
+		a["path"]       = relative(a["path"])
+		a["compressed"] = dict((k, [relative(v[0]), v[1]]) for k, v in a["compressed"].items())
+		res[relative(name)] = a
+	with open(path, "w") as f:
+		json.dump({"outputs":res}, f, indent=1, sort_keys=True)
+	return path
+
+# EOF - vim: ts=4 sw=4 noet
@@ -0,0 +1,209 @@
+#!/usr/bin/env python
+# encoding=utf8 ---------------------------------------------------------------
+# Project           : smalldoc
+# -----------------------------------------------------------------------------
+# Author            : FFunction
+# License           : BSD License
+# -----------------------------------------------------------------------------
+# Creation date     : 2016-12-22
+# Last modification : 2016-12-22
+# -----------------------------------------------------------------------------
+
+import os, json, hashlib, threading
+from   collections import OrderedDict
+
+__doc__ = """
+An on-disk cache of the elements produced by parsing a source file, so that
+unchanged inputs do not need to go through their driver again, an
+in-memory cache of these elements shared by the documentation sets built
+in the same process, and a bounded cache of rendered documentation.
+"""
+
+class Cache(object):
+	"""Stores the JSON representation of the elements produced by a driver
+	for a given source file. Entries are keyed by the content hash of the
+	file, its absolute path, the driver name and the smalldoc version, so
+	that any change to one of these invalidates the entry. The path is
+	part of the key as drivers derive module names and sources from it,
+	so identical files (like empty `__init__.py`) produce different
+	elements."""
+
+	def __init__( self, path, version=None ):
+		self.path    = path
+		self.version = version
+		if not os.path.exists(path):
+			os.makedirs(path)
+
+	def key( self, path, driver ):
+		"""Returns the cache key for the file at the given `path` parsed
+		with the given `driver` name."""
+		h = hashlib.sha1()
+		with open(path, "rb") as f:
+			for block in iter(lambda: f.read(65536), b""):
+				h.update(block)
+		h.update(b"\0" + os.path.abspath(path).encode("utf8", "surrogateescape"))
+		h.update(b"\0" + driver.encode("utf8"))
+		h.update(b"\0" + str(self.version).encode("utf8"))
+		return h.hexdigest()
+
+	def get( self, key ):
+		"""Returns the list of element JSON stored for the given key, or
+		`None` if there is no such entry."""
+		path = self._getPath(key)
+		if not os.path.exists(path):
+			return None
+		try:
+			with open(path) as f:
+				return json.load(f)
+		except ValueError:
+			# A corrupted entry is treated as a cache miss
+			return None
+
+	def set( self, key, elements ):
+		"""Stores the given list of element JSON for the given key. The entry
+		is written to a temporary file first, so that concurrent runs
+		never see a partial entry."""
+		path   = self._getPath(key)
+		parent = os.path.dirname(path)
+		if not os.path.exists(parent):
+			os.makedirs(parent)
+		import tempfile
+		fd, temp = tempfile.mkstemp(dir=parent, suffix=".tmp")
+		with os.fdopen(fd, "w") as f:
+			json.dump(elements, f)
+		os.rename(temp, path)
+		return elements
+
+	def _getPath( self, key ):
+		return os.path.join(self.path, key[:2], key[2:] + ".json")
+
+class MemoryCache(object):
+	"""Keeps the JSON of the elements parsed in this process in memory, in
+	front of an optional on-disk `Cache` (the `backing` cache), so that
+	inputs shared by several documentation sets are only parsed once. It
+	has the same interface as `Cache`, and holds at most `capacity`
+	entries, evicting the least recently used ones."""
+
+	def __init__( self, backing=None, version=None, capacity=1000 ):
+		self.backing  = backing
+		self.version  = backing.version if backing else version
+		self.capacity = capacity
+		self.entries  = OrderedDict()
+		self._lock    = threading.Lock()
+
+	def key( self, path, driver ):
+		return Cache.key(self, path, driver)
+
+	def get( self, key ):
+		with self._lock:
+			elements = self.entries.get(key)
+			if elements is not None:
+				self.entries.move_to_end(key)
+				return elements
+		elements = self.backing.get(key) if self.backing else None
+		if elements is not None:
+			self._add(key, elements)
+		return elements
+
+	def set( self, key, elements ):
+		self._add(key, elements)
+		if self.backing:
+			self.backing.set(key, elements)
+		return elements
+
+	def _add( self, key, elements ):
+		with self._lock:
+			self.entries[key] = elements
+			if len(self.entries) > self.capacity:
+				self.entries.popitem(last=False)
+
+class RenderCache(object):
+	"""A content-addressed, least-recently-used cache of rendered markup,
+	so that identical docstrings are only rendered once. Entries are keyed
+	by the markup, the text and the smalldoc version. The cache holds
+	at most `capacity` entries and, when given a `path`, is loaded from
+	and saved to that file, so that it persists across runs. The entries
+	rendered (or merged) since the cache was created are kept in `added`,
+	so that worker processes can hand them over to the process that saves
+	the cache."""
+
+	def __init__( self, capacity=10000, path=None, version=None ):
+		self.capacity = capacity
+		self.path     = path
+		self.version  = version
+		self.entries  = OrderedDict()
+		self.added    = OrderedDict()
+		self.hits     = 0
+		self.misses   = 0
+		self._lock    = threading.Lock()
+		if path and os.path.exists(path):
+			try:
+				with open(path) as f:
+					for key, value in json.load(f):
+						self.entries[key] = value
+			except ValueError:
+				pass
+			while len(self.entries) > capacity:
+				self.entries.popitem(last=False)
+
+	def key( self, text, markup ):
+		return hashlib.sha1((str(self.version) + "\0" + markup + "\0" + text).encode("utf8")).hexdigest()
+
+	def render( self, text, markup, renderer ):
+		"""Returns the rendering of `text` in the given `markup`, invoking
+		`renderer(text, markup)` only when it is not in the cache."""
+		key = self.key(text, markup)
+		with self._lock:
+			value = self.entries.get(key)
+			if value is not None:
+				self.entries.move_to_end(key)
+				self.hits += 1
+				return value
+		value = renderer(text, markup)
+		with self._lock:
+			self.misses += 1
+			self._add(key, value)
+		return value
+
+	def merge( self, entries ):
+		"""Adds the given `(key, value)` entries, as returned by
+		`takeAdded` in another process."""
+		with self._lock:
+			for key, value in entries:
+				self._add(key, value)
+
+	def takeAdded( self ):
+		"""Returns the list of `(key, value)` entries added since the last
+		call, and forgets them."""
+		with self._lock:
+			res = list(self.added.items())
+			self.added.clear()
+		return res
+
+	def _add( self, key, value ):
+		self.entries[key] = value
+		self.entries.move_to_end(key)
+		self.added[key]   = value
+		if len(self.entries) > self.capacity:
+			self.entries.popitem(last=False)
+		if len(self.added) > self.capacity:
+			self.added.popitem(last=False)
+
+	def save( self, path=None ):
+		"""Saves the entries, least recently used first, to the given path
+		(defaulting to the cache `path`)."""
+		path = path or self.path
+		if not path:
+			return None
+		parent = os.path.dirname(os.path.abspath(path))
+		if not os.path.exists(parent):
+			os.makedirs(parent)
+		import tempfile
+		fd, temp = tempfile.mkstemp(dir=parent, suffix=".tmp")
+		with os.fdopen(fd, "w") as f:
+			with self._lock:
+				json.dump(list(self.entries.items()), f)
+		os.rename(temp, path)
+		return path
+
+# EOF - vim: ts=4 sw=4 noet
@@ -0,0 +1,244 @@
+#!/usr/bin/env python
+# encoding=utf8 ---------------------------------------------------------------
+# Project           : smalldoc
+# -----------------------------------------------------------------------------
+# Author            : FFunction
+# License           : BSD License
+# -----------------------------------------------------------------------------
+# Creation date     : 2016-12-22
+# Last modification : 2016-12-22
+# -----------------------------------------------------------------------------
+
+import os, json, sqlite3
+from   smalldoc.model import Element, KEY_CLASS, REL_SLOT, REL_REFERENCES
+
+__doc__ = """
+Exports the model to an SQLite database with indexed tables for the
+elements, their tags, slots (children) and relations, so that questions
+like "which classes define method X" or "which elements are tagged
+`class method` in module Y" are answered by index lookups instead of
+loading the whole JSON. The `Database` class provides these queries.
+"""
+
+DATABASE_FORMAT = "smalldoc-sqlite-1"
+
+SCHEMA = """
+CREATE TABLE meta      (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE elements  (
+	rowid          INTEGER PRIMARY KEY,
+	id             TEXT,
+	name           TEXT,
+	type           TEXT,
+	module         INTEGER,
+	parent         TEXT,
+	documentation  TEXT,
+	representation TEXT,
+	source         TEXT,
+	range          TEXT
+);
+CREATE TABLE tags      (element INTEGER, tag TEXT);
+CREATE TABLE slots     (owner INTEGER, position INTEGER, name TEXT, element INTEGER, value TEXT);
+CREATE TABLE relations (element INTEGER, position INTEGER, verb TEXT, target INTEGER, arguments TEXT);
+"""
+
+# The indexes are created once the tables are filled, which is faster than
+# maintaining them during the inserts.
+INDEXES = """
+CREATE INDEX elements_id     ON elements  (id);
+CREATE INDEX elements_name   ON elements  (name, type);
+CREATE INDEX elements_type   ON elements  (type, module);
+CREATE INDEX tags_tag        ON tags      (tag, element);
+CREATE INDEX tags_element    ON tags      (element);
+CREATE INDEX slots_owner     ON slots     (owner, position);
+CREATE INDEX slots_name      ON slots     (name);
+CREATE INDEX slots_element   ON slots     (element);
+CREATE INDEX relations_elt   ON relations (element, verb);
+CREATE INDEX relations_verb  ON relations (verb, target);
+"""
+
+def write( documenter, path ):
+	"""Writes the model of the given documenter to a new SQLite database at
+	the given path, replacing any existing file once the database is
+	complete. All the rows are inserted in a single transaction."""
+	temp = "{0}.{1}.tmp".format(path, os.getpid())
+	if os.path.exists(temp):
+		os.unlink(temp)
+	db = sqlite3.connect(temp)
+	try:
+		db.execute("PRAGMA journal_mode=OFF")
+		db.execute("PRAGMA synchronous=OFF")
+		db.executescript(SCHEMA)
+		elements, tags, slots, relations = _getRows(documenter)
+		with db:
+			db.execute("INSERT INTO meta VALUES (?, ?)", ("format", DATABASE_FORMAT))
+			db.executemany("INSERT INTO elements  VALUES (?,?,?,?,?,?,?,?,?,?)", elements)
+			db.executemany("INSERT INTO tags      VALUES (?,?)", tags)
+			db.executemany("INSERT INTO slots     VALUES (?,?,?,?,?)", slots)
+			db.executemany("INSERT INTO relations VALUES (?,?,?,?,?)", relations)
+		db.executescript(INDEXES)
+		db.execute("ANALYZE")
+	finally:
+		db.close()
+	os.replace(temp, path)
+	return path
+
+def _getRows( documenter ):
+	"""Returns the rows of the `elements`, `tags`, `slots` and `relations`
+	tables. Elements are numbered in depth-first order, starting at 1."""
+	rowids = {}
+	order  = []
+	module = {}
+	for root in documenter.elements:
+		stack = [root]
+		while stack:
+			element = stack.pop()
+			if id(element) in rowids:
+				continue
+			rowids[id(element)] = len(order) + 1
+			module[id(element)] = root
+			order.append(element)
+			stack.extend(v for _, v in reversed(element.children or ()) if isinstance(v, Element))
+	def ref( value ):
+		return value.id if isinstance(value, Element) else value
+	# Relations hold elements or, when loaded from the cache or from worker
+	# processes, their ids, so targets are looked up by element id.
+	byid = dict((k, rowids[id(v)]) for k, v in documenter.ids.items() if id(v) in rowids)
+	elements, tags, slots, relations = [], [], [], []
+	for element in order:
+		rowid = rowids[id(element)]
+		elements.append((
+			rowid,
+			element.id,
+			element.name,
+			element.type,
+			rowids[id(module[id(element)])],
+			ref(element.parent),
+			element.documentation,
+			element.representation,
+			element.source,
+			json.dumps(element.range) if element.range else None,
+		))
+		for tag in element.tags or ():
+			tags.append((rowid, tag))
+		for i, (name, value) in enumerate(element.children or ()):
+			if isinstance(value, Element):
+				slots.append((rowid, i, name, rowids.get(id(value)), None))
+			else:
+				slots.append((rowid, i, name, None, json.dumps(value)))
+		for i, relation in enumerate(element.relations or ()):
+			# The target is the element referenced by the relation (the
+			# first argument of references, the value of slots), which
+			# makes reverse lookups (who extends X?) index hits.
+			verb   = relation[0]
+			args   = [ref(_) for _ in relation[1:]]
+			value  = args[0] if verb in REL_REFERENCES and args else args[1] if verb == REL_SLOT and len(args) > 1 else None
+			target = byid.get(value) if isinstance(value, str) else None
+			relations.append((rowid, i, verb, target, json.dumps(args)))
+	return elements, tags, slots, relations
+
+class Database(object):
+	"""Queries a database written by `write`. Elements are returned as
+	dictionaries with the `id`, `name`, `type`, `tags`, `parent`,
+	`documentation`, `representation`, `source` and `range` of the
+	element, along with its `module` id."""
+
+	COLUMNS = "e.rowid, e.id, e.name, e.type, m.id, e.parent, e.documentation, e.representation, e.source, e.range"
+
+	def __init__( self, path ):
+		self.path = path
+		self.db   = sqlite3.connect("file:{0}?mode=ro".format(path), uri=True, check_same_thread=False)
+		format    = self.db.execute("SELECT value FROM meta WHERE key='format'").fetchone()
+		if not format or format[0] != DATABASE_FORMAT:
+			raise ValueError("Unsupported database format: {0}".format(format[0] if format else None))
+
+	def close( self ):
+		self.db.close()
+
+	def get( self, id ):
+		"""Returns the element with the given id, or `None`."""
+		res = self._select("WHERE e.id = ? LIMIT 1", (id,))
+		return res[0] if res else None
+
+	def find( self, name, type=None ):
+		"""Returns the elements with the given name, and type if given."""
+		if type:
+			return self._select("WHERE e.name = ? AND e.type = ?", (name, type))
+		else:
+			return self._select("WHERE e.name = ?", (name,))
+
+	def getChildren( self, id ):
+		"""Returns the `(name, element)` slots of the given element, where
+		`element` is the value for slots that do not hold an element."""
+		res = []
+		for name, rowid, value in self.db.execute(
+			"SELECT s.name, s.element, s.value FROM slots s JOIN elements o ON o.rowid = s.owner "
+			"WHERE o.id = ? ORDER BY s.position", (id,)):
+			res.append((name, self._get(rowid) if rowid else json.loads(value)))
+		return res
+
+	def getDefiners( self, name, type=KEY_CLASS ):
+		"""Returns the elements of the given type (classes by default) that
+		define a slot with the given name, like the classes defining a
+		method."""
+		return self._select(
+			"JOIN slots s ON s.owner = e.rowid WHERE s.name = ? AND e.type = ?",
+			(name, type))
+
+	def getTagged( self, tag, module=None ):
+		"""Returns the elements with the given tag, within the module with
+		the given id if given."""
+		if module:
+			return self._select(
+				"JOIN tags t ON t.element = e.rowid WHERE t.tag = ? AND m.id = ?",
+				(tag, module))
+		else:
+			return self._select("JOIN tags t ON t.element = e.rowid WHERE t.tag = ?", (tag,))
+
+	def getRelations( self, id, verb=None ):
+		"""Returns the `[verb, argument…]` relations of the given element,
+		elements being referenced by id."""
+		query = "SELECT r.verb, r.arguments FROM relations r JOIN elements e ON e.rowid = r.element WHERE e.id = ?"
+		args  = (id,)
+		if verb:
+			query += " AND r.verb = ?"
+			args  += (verb,)
+		return [[v] + json.loads(a) for v, a in self.db.execute(query + " ORDER BY r.position", args)]
+
+	def getReferencing( self, id, verb ):
+		"""Returns the elements that have a relation with the given verb to
+		the given element, like the subclasses of a class (`parent`)."""
+		return self._select(
+			"JOIN relations r ON r.element = e.rowid JOIN elements t ON t.rowid = r.target "
+			"WHERE r.verb = ? AND t.id = ?", (verb, id))
+
+	def _get( self, rowid ):
+		res = self._select("WHERE e.rowid = ?", (rowid,))
+		return res[0] if res else None
+
+	def _select( self, where, args ):
+		rows = self.db.execute(
+			"SELECT DISTINCT " + self.COLUMNS + " FROM elements e JOIN elements m ON m.rowid = e.module " + where,
+			args).fetchall()
+		tags = {}
+		ids  = [_[0] for _ in rows]
+		# The tags are fetched in batches, within SQLite's limit of
+		# parameters per query.
+		for i in range(0, len(ids), 500):
+			batch = ids[i:i + 500]
+			for element, tag in self.db.execute(
+				"SELECT element, tag FROM tags WHERE element IN ({0}) ORDER BY rowid".format(",".join("?" * len(batch))), batch):
+				tags.setdefault(element, []).append(tag)
+		return [dict((k, v) for k, v in (
+			("id",             r[1]),
+			("name",           r[2]),
+			("type",           r[3]),
+			("tags",           tags.get(r[0])),
+			("module",         r[4]),
+			("parent",         r[5]),
+			("documentation",  r[6]),
+			("representation", r[7]),
+			("source",         r[8]),
+			("range",          json.loads(r[9]) if r[9] else None),
+		) if v) for r in rows]
+
+# EOF - vim: ts=4 sw=4 noet
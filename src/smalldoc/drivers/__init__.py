@@ -10,23 +10,40 @@
 # -----------------------------------------------------------------------------
 
 import re
-from   functools import reduce
-
-try:
-	import texto.parser, texto.main
-except ImportError as e:
-	texto = None
+from   smalldoc.profiler import NO_STAGE
+from   smalldoc.sources  import SOURCES
+
+# The `texto` module, imported on first use by `getTexto`, `False` when
+# it is not available.
+_texto = None
+
+def getTexto():
+	"""Returns the `texto` module, or `None` when it is not available. The
+	module is only imported on the first call, so that drivers which
+	do not render Texto do not pay for its import."""
+	global _texto
+	if _texto is None:
+		try:
+			import texto.parser, texto.main
+			_texto = texto
+		except ImportError as e:
+			_texto = False
+	return _texto or None
 
 RE_INDENT = re.compile("^([\t ]*)")
+TAB_WIDTH = 4
 
 class Driver(object):
 
-	def __init__( self, documenter, path=(), logger=None ):
-		self.documenter = documenter
-		self.scopes     = []
-		self.path       = path
-		self._sources   = {}
-		self.logger     = logger
+	def __init__( self, documenter, path=(), logger=None, options=None ):
+		self.documenter  = documenter
+		self.options     = options or {}
+		self.scopes      = []
+		self.path        = path
+		self.sources     = SOURCES
+		self.logger      = logger
+		self.profiler    = None
+		self.renderCache = None
 		self.init()
 
 	def info( self, *message ):
@@ -41,61 +58,93 @@ class Driver(object):
 	def init( self ):
 		pass
 
+	def profile( self, stage, path=None, detail=None ):
+		"""Returns a context manager recording the time spent in the given
+		stage when the driver has a `profiler`."""
+		return self.profiler.stage(stage, path, detail) if self.profiler else NO_STAGE
+
 	def parse( self, name ):
 		"""Parses the given path or module name."""
 		raise NotImplementedError
 
+	def prepare( self, paths ):
+		"""Invoked with the paths that are about to be parsed by this driver,
+		so that drivers can process them together. Does nothing by
+		default."""
+		pass
+
 	def readSource( self, path, start=None, end=None):
-		text = self._sources.get(path)
-		if path not in self._sources:
-			with open(path) as f:
-				text = f.read()
-				self._sources[path] = text
-		if start is None and end is None:
-			return text
-		elif start is None:
-			return text[:end]
-		else:
-			return text[start:end]
+		"""Returns the text of the source at the given path, between the
+		given offsets. Sources are memory-mapped in a store shared by all
+		the drivers."""
+		return self.sources.read(path, start, end)
+
+	def getSourcePosition( self, path, offset ):
+		"""Returns the `(line, column)` of the given offset in the given
+		source."""
+		return self.sources.get(path).getPosition(offset)
 
 	def render( self, text, markup ):
+		"""Renders the given text in the given markup to HTML. Renderings are
+		memoized when the driver has a `renderCache`."""
+		with self.profile("render:" + markup, detail=text):
+			if self.renderCache:
+				return self.renderCache.render(text, markup, self._render)
+			else:
+				return self._render(text, markup)
+
+	def _render( self, text, markup ):
 		if markup == "texto":
+			texto = getTexto()
 			first_line_indent = texto.parser.Parser.getIndentation(text[:text.find("\n")])
 			text_indent = texto.parser.Parser.getIndentation(text)
 			text = " " * (text_indent - first_line_indent) + text
 			return texto.main.text2htmlbody(text)
+		elif markup == "text":
+			return "<pre>" + self.escape(self.unindent(text).strip()) + "</pre>"
 		else:
 			raise NotImplementedError
 
+	def escape( self, text ):
+		return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
 	def toJSON( self ):
 		return self.documenter.toJSON()
 
-	def _getLineIndent( self, line, match=None ):
-		return (match or RE_INDENT.match(line)).group().replace("\t", " ")
-
-	def _getLinesIndent( self, lines ):
-		indent = [len(self._getLineIndent(_)) for _ in lines]
-		if   len(indent) == 0:
-			return 0
-		elif len(indent) == 1:
-			return indent[0]
-		else:
-			return reduce(min, indent[1:])
-
-	def _reindentLine( self, line, delta ):
-		indent = RE_INDENT.match(line).group()
-		i      = 0
-		while delta > 0 and indent:
-			if indent[0] == '\t':
-				delta -= 4
-			else:
-				delta -= 1
-			i += 1
-		return line[i:]
+	def _getIndentWidth( self, indent ):
+		"""Returns the width in columns of the given indentation, tabs
+		advancing to the next multiple of `TAB_WIDTH`."""
+		return len(indent.expandtabs(TAB_WIDTH)) if "\t" in indent else len(indent)
+
+	def _dedentIndent( self, indent, width ):
+		"""Returns the given indentation with `width` columns removed. A tab
+		that straddles the boundary is replaced by the spaces that remain
+		after it."""
+		if "\t" not in indent:
+			return indent[width:]
+		column = 0
+		for i, c in enumerate(indent):
+			if column >= width:
+				return indent[i:]
+			column = (column // TAB_WIDTH + 1) * TAB_WIDTH if c == "\t" else column + 1
+		return " " * max(0, column - width)
 
 	def unindent( self, text ):
-		lines  = text.split("\n")
-		indent = self._getLinesIndent(lines)
-		return "\n".join(self._reindentLine(_, indent) for _ in lines)
+		"""Removes the common indentation of the given text. The first line
+		is not taken into account when there are several lines, as source
+		extracts start at the beginning of the element and not of the line.
+		Blank lines are ignored as well."""
+		with self.profile("unindent"):
+			lines   = text.split("\n")
+			indents = [_[:len(_) - len(_.lstrip(" \t"))] for _ in lines]
+			# These are the indents of the non-blank lines
+			counted = [i for l, i in zip(lines[1:], indents[1:]) if len(i) < len(l)] if len(lines) > 1 else indents[:1]
+			width   = min(self._getIndentWidth(_) for _ in counted) if counted else 0
+			if width == 0:
+				return text
+			# There are only a few distinct indents in a text, so each is
+			# dedented once.
+			dedented = dict((_, self._dedentIndent(_, width)) for _ in set(indents))
+			return "\n".join(dedented[i] + l[len(i):] for l, i in zip(lines, indents))
 
 # EOF - vim: ts=4 sw=4 noet
@@ -0,0 +1,251 @@
+#!/usr/bin/env python
+# encoding=utf8 ---------------------------------------------------------------
+# Project           : smalldoc
+# -----------------------------------------------------------------------------
+# Author            : FFunction
+# License           : BSD License
+# -----------------------------------------------------------------------------
+# Creation date     : 2016-12-22
+# Last modification : 2016-12-22
+# -----------------------------------------------------------------------------
+
+from __future__ import print_function
+
+import os, io, sys, ast, tokenize
+from smalldoc.drivers import Driver, getTexto
+from smalldoc.model   import *
+
+__doc__ = """
+Defines the driver for extracting documentation information from Python
+source files. Modules are parsed with `ast` and never imported, so that
+documenting them has no side effects and does not depend on their
+dependencies.
+"""
+
+class PythonDriver(Driver):
+	"""Parses Python source files and generates the smalldoc model."""
+
+	def init( self ):
+		self._path   = None
+		self._source = None
+		self._text   = None
+
+	def parse( self, name ):
+		"""Parses the given path or (dotted) module name."""
+		path = name if os.path.exists(name) else self.findModule(name)
+		if not path:
+			raise ValueError("Cannot find Python module: `{0}`".format(name))
+		return self.parsePath(path)
+
+	def findModule( self, name ):
+		"""Returns the path of the source file of the given module name,
+		looked up in the library paths and then `sys.path`, without
+		importing anything."""
+		base = name.replace(".", os.sep)
+		for root in list(self.path or ()) + sys.path:
+			for path in (os.path.join(root, base + ".py"), os.path.join(root, base, "__init__.py")):
+				if os.path.exists(path):
+					return path
+		return None
+
+	def getModuleName( self, path ):
+		"""Returns the dotted name of the module at the given path, walking
+		up the parent packages."""
+		path   = os.path.abspath(path)
+		parent = os.path.dirname(path)
+		name   = os.path.splitext(os.path.basename(path))[0]
+		names  = [] if name == "__init__" else [name]
+		while os.path.exists(os.path.join(parent, "__init__.py")):
+			names.insert(0, os.path.basename(parent))
+			parent = os.path.dirname(parent)
+		return ".".join(names) or name
+
+	def parsePath( self, path ):
+		"""Parses the module at the given path, decoded with the encoding it
+		declares. Modules that cannot be decoded are skipped, returning
+		`None`."""
+		source = self.sources.get(path)
+		# The encoding is declared in the first two lines
+		end    = source.data.find(b"\n", source.data.find(b"\n") + 1)
+		try:
+			encoding = tokenize.detect_encoding(io.BytesIO(source.data[:end + 1] if end != -1 else source.data[:]).readline)[0]
+			source   = self.sources.get(path, encoding)
+			text     = source.text
+		except (SyntaxError, LookupError, UnicodeDecodeError) as e:
+			self.error("Cannot decode Python module `{0}`: {1}".format(path, e))
+			return None
+		self._path   = path
+		self._source = source
+		self._text   = text
+		with self.profile("compile", path):
+			tree = ast.parse(self._text, path)
+		return self.onModule(tree, self.getModuleName(path))
+
+	# =========================================================================
+	# ELEMENTS
+	# =========================================================================
+
+	def onModule( self, node, name ):
+		e = self.documenter.createModule(
+			name          = name,
+			id            = name,
+			documentation = self._getDocumentation(node),
+		)
+		e.addRelation(REL_SOURCE, self._path, [0, len(self._text)])
+		self.scopes.append(name)
+		self._setSlots(node, e)
+		self.scopes.pop()
+		return self.documenter.addElement(e)
+
+	def onClass( self, node ):
+		e = self.documenter.createClass(
+			name          = node.name,
+			id            = self._getID(node.name),
+			tags          = [],
+			documentation = self._getDocumentation(node),
+		)
+		for base in node.bases:
+			e.addRelation(REL_PARENT, self._getExpression(base))
+		self._setDecorators(node, e)
+		self.scopes.append(node.name)
+		self._setSlots(node, e)
+		self.scopes.pop()
+		return e
+
+	def onFunction( self, node, inClass=False ):
+		decorators = [self._getExpression(_) for _ in node.decorator_list]
+		e = self.documenter.createFunction(
+			name          = node.name,
+			id            = self._getID(node.name),
+			tags          = self._getFunctionTags(node, decorators, inClass),
+			documentation = self._getDocumentation(node),
+		)
+		args = self._getArguments(node.args)
+		e.addRelation(REL_ARGUMENTS, args)
+		self._setDecorators(node, e)
+		a = "".join("<span class='argument'>" + self.escape(_) + "</span>" for _ in args)
+		e.representation = "<span class='name'>{0}</span><span class='arguments'>{1}</span>".format(node.name, a)
+		return e
+
+	def onValue( self, node, name, inClass=False ):
+		return self.documenter.createElement(
+			name           = name,
+			id             = self._getID(name),
+			type           = KEY_VALUE,
+			tags           = self._getValueTags(node.value, inClass),
+			representation = self.unindent(self._getSegment(node.value)) if node.value is not None else None,
+		)
+
+	# =========================================================================
+	# HELPERS
+	# =========================================================================
+
+	def on( self, node, inClass=False ):
+		"""Returns the list of `(name, element)` defined by the given
+		statement."""
+		res = []
+		if isinstance(node, ast.ClassDef):
+			res.append((node.name, self.onClass(node)))
+		elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+			res.append((node.name, self.onFunction(node, inClass)))
+		elif isinstance(node, ast.Assign):
+			for target in node.targets:
+				if isinstance(target, ast.Name):
+					res.append((target.id, self.onValue(node, target.id, inClass)))
+		elif isinstance(node, ast.AnnAssign) and isinstance(node.target, ast.Name):
+			res.append((node.target.id, self.onValue(node, node.target.id, inClass)))
+		for _, element in res:
+			element.addRelation(REL_SOURCE, self._path, self._getRange(node))
+		return res
+
+	def _setSlots( self, node, element ):
+		inClass = isinstance(node, ast.ClassDef)
+		for statement in node.body:
+			for name, value in self.on(statement, inClass):
+				element.setSlot(name, value)
+		return element
+
+	def _setDecorators( self, node, element ):
+		if node.decorator_list:
+			element.addRelation(REL_DECORATORS, [self._getExpression(_) for _ in node.decorator_list])
+		return element
+
+	def _getID( self, name ):
+		return ".".join(self.scopes + [name])
+
+	def _getDocumentation( self, node ):
+		doc = ast.get_docstring(node, clean=False)
+		if doc:
+			return self.render(doc, "texto" if getTexto() else "text")
+		else:
+			return None
+
+	def _getFunctionTags( self, node, decorators, inClass ):
+		if not inClass:
+			return [KEY_FUNCTION]
+		elif "classmethod" in decorators or "staticmethod" in decorators:
+			return [KEY_CLASS_METHOD]
+		elif node.name == "__init__":
+			return [KEY_CONSTRUCTOR]
+		else:
+			return [KEY_METHOD]
+
+	def _getValueTags( self, value, inClass ):
+		res = []
+		if inClass:                                 res.append(KEY_CLASS_ATTRIBUTE)
+		if isinstance(value, ast.Constant):
+			if isinstance(value.value, str):       res.append(KEY_STRING)
+			elif isinstance(value.value, (int, float)) and not isinstance(value.value, bool): res.append(KEY_NUMBER)
+		elif isinstance(value, (ast.List, ast.Tuple)): res.append(KEY_LIST)
+		elif isinstance(value, ast.Dict):           res.append(KEY_MAP)
+		elif isinstance(value, (ast.Name, ast.Attribute)): res.append(KEY_REFERENCE)
+		return res
+
+	def _getArguments( self, args ):
+		"""Returns the arguments formatted like the Sugar driver does:
+		`name:type=default`, `*rest` and `**keywords`."""
+		res        = []
+		positional = list(getattr(args, "posonlyargs", ())) + list(args.args)
+		defaults   = [None] * (len(positional) - len(args.defaults)) + list(args.defaults)
+		for arg, default in zip(positional, defaults):
+			res.append(self._formatArgument(arg, default))
+		if args.vararg:
+			res.append("*" + self._formatArgument(args.vararg))
+		for arg, default in zip(args.kwonlyargs, args.kw_defaults):
+			res.append(self._formatArgument(arg, default))
+		if args.kwarg:
+			res.append("**" + self._formatArgument(args.kwarg))
+		return res
+
+	def _formatArgument( self, arg, default=None ):
+		a = arg.arg
+		if arg.annotation is not None: a += ":" + self._getExpression(arg.annotation)
+		if default is not None:        a += "=" + self._getExpression(default)
+		return a
+
+	def _getExpression( self, node ):
+		return self._getSegment(node).strip()
+
+	def _getSegment( self, node ):
+		start, end = self._getRange(node)
+		return self._text[start:end]
+
+	def _getRange( self, node ):
+		"""Returns the character offsets of the given node, using the line
+		index of the source. The AST gives UTF-8 byte columns, which only
+		differ for non-ASCII lines."""
+		return [
+			self._getOffset(node.lineno, node.col_offset),
+			self._getOffset(node.end_lineno, node.end_col_offset),
+		]
+
+	def _getOffset( self, line, column ):
+		if column and not self._source.isRaw:
+			lines = self._source.lines
+			start = lines[line - 1]
+			text  = self._text[start:lines[line] if line < len(lines) else len(self._text)]
+			if not text.isascii():
+				column = len(text.encode("utf8")[:column].decode("utf8", "ignore"))
+		return self._source.getOffset(line, column)
+
+# EOF - vim: ts=4 sw=4 noet
@@ -11,9 +11,8 @@
 
 from __future__ import print_function
 
-import re, os
-from lambdafactory.interfaces import *
-from smalldoc.drivers import Driver
+import re, os, importlib, threading
+from smalldoc.drivers import Driver, getTexto
 from smalldoc.model   import *
 
 __doc__ = """
@@ -21,35 +20,140 @@ Defines the driver for extracting documentation information from
 Sugar source files.
 """
 
+# The `lambdafactory.interfaces` module, which is only needed by the
+# compiler-based parser and imported by `compilePath`.
+interfaces = None
+
 RE_FEATURE = re.compile("^@feature\s+sugar\s*[= ]\s*2.*$")
+RE_MODULE  = re.compile(r"^@module\s+([\w\.]+)", re.M)
+
+# Expressions used by the declaration-only skim parser
+RE_DECLARATION = re.compile(r"^[ \t]*@(\w+)\b[ \t]*(.*?)[ \t]*$")
+RE_DOCSTRING   = re.compile(r"^[ \t]*\|[ ]?(.*)$")
+RE_SLOT        = re.compile(r"^([\w\$]+)(?:\s*:\s*([^=\s]+))?\s*(?:=\s*(.*))?$")
+RE_CLASS       = re.compile(r"^([\w\$]+)\s*(?::\s*(.*))?$")
+RE_NUMBER      = re.compile(r"^-?[\d\.]+$")
+RE_REFERENCE   = re.compile(r"^[\w\$\.]+$")
+
+# Declarations that define a class-like scope, closed by `@end`
+SKIM_CLASSES   = ("class", "trait", "protocol", "singleton")
+# Declarations that define a function-like block, closed by `@end`, with
+# the tag they are given.
+SKIM_FUNCTIONS = {
+	"function"    : KEY_FUNCTION,
+	"method"      : KEY_METHOD,
+	"operation"   : KEY_CLASS_METHOD,
+	"constructor" : KEY_CONSTRUCTOR,
+	"getter"      : KEY_METHOD,
+	"setter"      : KEY_METHOD,
+}
+# Other declarations closed by `@end`, which are not documented
+SKIM_BLOCKS    = ("main", "destructor", "accessor", "mutator", "group")
 
 class SugarDriver(Driver):
 	"""Parses Sugar source files and generates the smalldoc model."""
 
+	def init( self ):
+		# The modules compiled by `prepare` and not documented yet, by
+		# absolute path.
+		self.compiled   = {}
+		self._compiling = threading.RLock()
+
 	def parse( self, path ):
 		# TODO: Parse a module
 		return self.parsePath(path)
 
-	def _parseSugar1( self, path ):
+	def prepare( self, paths ):
+		"""When the `compile` option is set, compiles the given paths with a
+		single compiler invocation (per Sugar version), so that the
+		modules they import are loaded once for all of them instead of
+		once per path. The compiled modules are then documented by
+		`parsePath`."""
+		if self.options.get("compile"):
+			self._compile(paths)
+
+	def _parseSugar1( self, paths ):
 		import sugar.main
-		self.info("Parsing Sugar1: {0}".format(path))
-		return sugar.main.run(["-clnone", "-Llib/sjs", "-Lsrc/sjs"] + ["-L" + _ for _ in self.path or ()] + [path])
+		self.info("Parsing Sugar1: {0}".format(", ".join(paths)))
+		return sugar.main.run(["-clnone", "-Llib/sjs", "-Lsrc/sjs"] + ["-L" + _ for _ in self.path or ()] + list(paths))
 
-	def _parseSugar2( self, path ):
+	def _parseSugar2( self, paths ):
 		import sugar2.command
-		self.info("Parsing Sugar2: {0}".format(path))
-		return sugar2.command.run(["-clnone", "-Llib/sjs", "-Lsrc/sjs"] + ["-L" + _ for _ in self.path or ()] + [path])
+		self.info("Parsing Sugar2: {0}".format(", ".join(paths)))
+		return sugar2.command.run(["-clnone", "-Llib/sjs", "-Lsrc/sjs"] + ["-L" + _ for _ in self.path or ()] + list(paths))
 
 	def parsePath( self, path ):
-		parser = self._parseSugar1
+		"""Parses the Sugar file at the given path. Unless the `compile`
+		option is set, only the declarations and docstrings are read with
+		`skimPath`, without resolving imports or generating code."""
+		if self.options.get("compile"):
+			return self.compilePath(path)
+		else:
+			return self.skimPath(path)
+
+	def compilePath( self, path ):
+		"""Parses the given path with the full Sugar compiler, which resolves
+		and loads the imported modules, unless it was already compiled by
+		`prepare`."""
+		key = os.path.abspath(path)
+		with self._compiling:
+			if key not in self.compiled:
+				self._compile([path])
+			modules = self.compiled.pop(key)
+		for module in modules:
+			self.onModule(module)
+
+	def getModuleName( self, path ):
+		"""Returns the name of the module defined in the given file, which
+		is either declared with `@module` or the name of the file."""
+		m = RE_MODULE.search(self.readSource(path))
+		return m.group(1) if m else os.path.splitext(os.path.basename(path))[0]
+
+	def _compile( self, paths ):
+		"""Compiles the given paths that are not already compiled, grouped by
+		Sugar version, and registers their (non-imported) modules in
+		`compiled`. Modules are matched to their path by name: paths that
+		declare the same module name are compiled in separate invocations,
+		and paths whose modules cannot be matched are left to be compiled
+		on their own by `compilePath`."""
+		global interfaces
+		if interfaces is None:
+			interfaces = importlib.import_module("lambdafactory.interfaces")
+		with self._compiling:
+			groups = []
+			for path in paths:
+				if os.path.abspath(path) in self.compiled:
+					continue
+				parser, name = self._getParser(path), self.getModuleName(path)
+				group = next((_ for _ in groups if _[0] == parser and name not in _[1]), None)
+				if group is None:
+					group = (parser, {})
+					groups.append(group)
+				group[1][name] = path
+			for parser, names in groups:
+				group = list(names.values())
+				with self.profile("compile", group[0] if len(group) == 1 else None, ", ".join(group)):
+					program = parser(group)
+				modules = dict((_, []) for _ in group)
+				for module in program.getModules():
+					if module.isImported(): continue
+					# A single path gets all the modules, as before
+					path = group[0] if len(group) == 1 else names.get(module.getName())
+					if path:
+						modules[path].append(module)
+					else:
+						self.warn("Cannot find the source of module: {0}, the unmatched paths are compiled separately".format(module.getName()))
+				for path in group:
+					if modules[path] or len(group) == 1:
+						self.compiled[os.path.abspath(path)] = modules[path]
+		return self.compiled
+
+	def _getParser( self, path ):
 		with open(path) as f:
 			for l in f.readlines()[0:100]:
 				if RE_FEATURE.match(l):
-					parser = self._parseSugar2
-		program = parser(path)
-		for module in program.getModules():
-			if module.isImported(): continue
-			self.onModule(module)
+					return self._parseSugar2
+		return self._parseSugar1
 
 	def onModule( self, model ):
 		e = self.documenter.createModule(
@@ -132,23 +236,207 @@ class SugarDriver(Driver):
 			representation=self._getRepresentation(value)
 		)
 
+	# =========================================================================
+	# SKIM PARSER
+	# =========================================================================
+
+	def skimPath( self, path ):
+		"""Reads the declarations (`@module`, `@class`, `@function`, `@method`,
+		`@shared`, `@property`…) and their docstrings from the given Sugar
+		file, creating the same elements as the compiler-based parser.
+		Function bodies are skipped, and imports are neither resolved nor
+		loaded."""
+		text     = self.readSource(path)
+		name     = os.path.splitext(os.path.basename(path))[0]
+		module   = self.documenter.createModule(name=name, id=name)
+		# The stack of `(element, start offset)` blocks closed by `@end`
+		stack    = [(module, 0)]
+		# The element which docstring is being read, and its lines
+		pending  = module
+		doc      = []
+		offset   = 0
+		lines    = text.split("\n")
+		i        = 0
+		with self.profile("skim", path):
+			while i < len(lines):
+				line   = lines[i]
+				start  = offset
+				offset += len(line) + 1
+				i      += 1
+				m = RE_DOCSTRING.match(line) if pending is not None else None
+				if m:
+					doc.append(m.group(1))
+					continue
+				elif pending is not None:
+					self._setSkimDocumentation(pending, doc)
+					pending, doc = None, []
+				m = RE_DECLARATION.match(line)
+				if not m:
+					continue
+				keyword, rest = m.groups()
+				scope = stack[-1][0]
+				if keyword == "end":
+					if len(stack) > 1:
+						element, s = stack.pop()
+						if element is not None:
+							element.addRelation(REL_SOURCE, path, [s, offset - 1])
+				elif keyword == "module":
+					module.name = module.id = rest.split()[0] if rest else name
+					pending = module
+				elif keyword in SKIM_CLASSES:
+					pending = self._skimClass(scope, stack, rest)
+					stack.append((pending, start))
+				elif keyword in SKIM_FUNCTIONS:
+					pending = self._skimFunction(scope, stack, keyword, rest)
+					stack.append((pending, start))
+				elif keyword in SKIM_BLOCKS:
+					stack.append((None, start))
+				elif keyword in ("shared", "property"):
+					# Values may span several lines, until their brackets
+					# are balanced.
+					depth = self._getDepth(rest)
+					while depth > 0 and i < len(lines):
+						rest   += "\n" + lines[i]
+						depth  += self._getDepth(lines[i])
+						offset += len(lines[i]) + 1
+						i      += 1
+					pending = self._skimValue(scope, stack, keyword, rest)
+					if pending:
+						pending.addRelation(REL_SOURCE, path, [start, offset - 1])
+				elif keyword == "enum":
+					pending = self._skimEnumeration(scope, stack, rest)
+			if pending is not None:
+				self._setSkimDocumentation(pending, doc)
+		module.addRelation(REL_SOURCE, path, [0, len(text)])
+		return self.documenter.addElement(module)
+
+	def _skimClass( self, scope, stack, rest ):
+		m       = RE_CLASS.match(rest)
+		name    = m.group(1) if m else rest.split()[0]
+		element = self.documenter.createClass(
+			name = name,
+			id   = self._getSkimID(stack, name),
+			tags = [],
+		)
+		for parent in self._splitArguments(m.group(2) if m and m.group(2) else ""):
+			element.addRelation(REL_PARENT, parent.split(":")[0].strip())
+		scope.setSlot(name, element)
+		return element
+
+	def _skimFunction( self, scope, stack, keyword, rest ):
+		if keyword == "constructor":
+			name, args = "init", rest
+		else:
+			parts      = rest.split(None, 1)
+			name       = parts[0].split(":")[0] if parts else keyword
+			args       = parts[1] if len(parts) > 1 else ""
+		args    = self._splitArguments(args[1:-1] if args.startswith("(") and args.endswith(")") else args)
+		element = self.documenter.createFunction(
+			name = name,
+			id   = self._getSkimID(stack, name),
+			tags = [SKIM_FUNCTIONS[keyword] if scope.type == KEY_CLASS else KEY_FUNCTION],
+		)
+		element.addRelation(REL_ARGUMENTS, args)
+		a = "".join("<span class='argument'>" + self.escape(_) + "</span>" for _ in args)
+		element.representation = "<span class='name'>{0}</span><span class='arguments'>{1}</span>".format(name, a)
+		scope.setSlot(name, element)
+		return element
+
+	def _skimValue( self, scope, stack, keyword, rest ):
+		m = RE_SLOT.match(rest.split("\n")[0])
+		if not m:
+			return None
+		name  = m.group(1)
+		value = rest[rest.index("=") + 1:].strip() if m.group(3) is not None else None
+		tags  = []
+		if keyword == "shared" and scope.type == KEY_CLASS: tags.append(KEY_CLASS_ATTRIBUTE)
+		if value:
+			if   RE_NUMBER.match(value):       tags.append(KEY_NUMBER)
+			elif value[0] in "\"'":          tags.append(KEY_STRING)
+			elif value[0] == "[":             tags.append(KEY_LIST)
+			elif value[0] == "{":             tags.append(KEY_MAP)
+			elif RE_REFERENCE.match(value):   tags.append(KEY_REFERENCE)
+		element = self.documenter.createElement(
+			name           = name,
+			id             = self._getSkimID(stack, name),
+			type           = KEY_VALUE,
+			tags           = tags,
+			representation = self.unindent(value) if value else None,
+		)
+		scope.setSlot(name, element)
+		return element
+
+	def _skimEnumeration( self, scope, stack, rest ):
+		name, _, symbols = rest.partition("=")
+		name    = name.strip().split()[0] if name.strip() else "enum"
+		element = self.documenter.createElement(
+			name = name,
+			id   = self._getSkimID(stack, name),
+			type = KEY_ENUM,
+		)
+		for symbol in [_ for _ in re.split(r"[\s,|]+", symbols) if _]:
+			element.setSlot(symbol, self.documenter.createElement(
+				name           = symbol,
+				id             = element.id + "." + symbol,
+				type           = KEY_VALUE,
+				tags           = [],
+				representation = symbol,
+			))
+		scope.setSlot(name, element)
+		return element
+
+	def _setSkimDocumentation( self, element, lines ):
+		if lines:
+			element.documentation = self.render("\n".join(lines), "texto" if getTexto() else "text")
+		return element
+
+	def _getSkimID( self, stack, name ):
+		return ".".join([_[0].name for _ in stack if _[0] is not None] + [name])
+
+	def _getDepth( self, text ):
+		"""Returns the number of brackets opened and not closed in the given
+		text."""
+		return sum(text.count(_) for _ in "([{") - sum(text.count(_) for _ in ")]}")
+
+	def _splitArguments( self, text ):
+		"""Splits the given argument list on the commas that are not
+		within brackets or strings."""
+		res, depth, quote, current = [], 0, None, ""
+		for c in text:
+			if quote:
+				quote = None if c == quote else quote
+			elif c in "\"'":
+				quote = c
+			elif c in "([{":
+				depth += 1
+			elif c in ")]}":
+				depth -= 1
+			elif c == "," and depth == 0:
+				res.append(current.strip())
+				current = ""
+				continue
+			current += c
+		if current.strip():
+			res.append(current.strip())
+		return res
+
 	# =========================================================================
 	# HELPERS
 	# =========================================================================
 
 	def on( self, model ):
 		res = None
-		if isinstance(model, IFunction) or isinstance(model, IClassMethod) or isinstance(model, IMethod):
+		if isinstance(model, interfaces.IFunction) or isinstance(model, interfaces.IClassMethod) or isinstance(model, interfaces.IMethod):
 			res = self.onFunction(model)
-		elif isinstance(model, IClass):
+		elif isinstance(model, interfaces.IClass):
 			res = self.onClass(model)
-		elif isinstance(model, IAttribute):
+		elif isinstance(model, interfaces.IAttribute):
 			res = self.onValue(model)
-		elif isinstance(model, IEnumerationType):
+		elif isinstance(model, interfaces.IEnumerationType):
 			res = self.onEnumeration(model)
-		elif isinstance(model, IType):
+		elif isinstance(model, interfaces.IType):
 			res = self.onType(model)
-		elif isinstance(model, IImportOperation):
+		elif isinstance(model, interfaces.IImportOperation):
 			pass
 		elif model:
 			raise Exception("Type not supported: {0}".format(model))
@@ -177,7 +465,7 @@ class SugarDriver(Driver):
 			return None
 
 	def _getRepresentation( self, model ):
-		if not isinstance(model, IElement):
+		if not isinstance(model, interfaces.IElement):
 			return str(model)
 		elif model and model.sourceLocation:
 			s,e,p = model.sourceLocation
@@ -187,16 +475,16 @@ class SugarDriver(Driver):
 
 	def _getTags( self, model ):
 		res = []
-		if   isinstance(model, IClassAttribute): res.append(KEY_CLASS_ATTRIBUTE)
-		if   isinstance(model, IConstructor):    res.append(KEY_CONSTRUCTOR)
-		elif isinstance(model, IClassMethod):    res.append(KEY_CLASS_METHOD)
-		elif isinstance(model, IMethod):         res.append(KEY_METHOD)
-		elif isinstance(model, IFunction):       res.append(KEY_FUNCTION)
-		if   isinstance(model, INumber):         res.append(KEY_NUMBER)
-		if   isinstance(model, IString):         res.append(KEY_STRING)
-		if   isinstance(model, IList):           res.append(KEY_LIST)
-		if   isinstance(model, IDict):           res.append(KEY_MAP)
-		if   isinstance(model, IReference):      res.append(KEY_REFERENCE)
+		if   isinstance(model, interfaces.IClassAttribute): res.append(KEY_CLASS_ATTRIBUTE)
+		if   isinstance(model, interfaces.IConstructor):    res.append(KEY_CONSTRUCTOR)
+		elif isinstance(model, interfaces.IClassMethod):    res.append(KEY_CLASS_METHOD)
+		elif isinstance(model, interfaces.IMethod):         res.append(KEY_METHOD)
+		elif isinstance(model, interfaces.IFunction):       res.append(KEY_FUNCTION)
+		if   isinstance(model, interfaces.INumber):         res.append(KEY_NUMBER)
+		if   isinstance(model, interfaces.IString):         res.append(KEY_STRING)
+		if   isinstance(model, interfaces.IList):           res.append(KEY_LIST)
+		if   isinstance(model, interfaces.IDict):           res.append(KEY_MAP)
+		if   isinstance(model, interfaces.IReference):      res.append(KEY_REFERENCE)
 		return res
 
 # EOF - vim: ts=4 sw=4 noet
@@ -44,7 +44,7 @@ class TextoProcessor(Processor):
 		self._setLocation(e, element)
 		self.context.pop()
 		self.driver.documenter.addElement(e)
-	 	return html
+		return html
 
 	# def on_Header( self, element ):
 	# 	pass
@@ -31,10 +31,10 @@
 # TOOD: Add 'important' tags for classes that have many methods
 # TODO: Add Exceptions group
 
-import os, sys, types, string, fnmatch, re, pprint, functools
+import os, io, sys, re, functools, json, contextlib
 import smalldoc
-from   .model      import Documenter
-from   .drivers.sg import SugarDriver
+from   .model      import Documenter, Element, FORMATS_DATA
+from   .cache      import Cache, MemoryCache, RenderCache
 
 try:
 	import reporter
@@ -64,6 +64,17 @@ JavaScript-based documentation that have a SmallTalk feel.
 See <http://www.github.com/sebastien/smalldoc> for more information."""
 USAGE = "%prog [options] module.py module.name ... [output file]"
 
+# The keys of a batch manifest job, and their default values
+BATCH_JOB = {
+	"name"    : None,
+	"inputs"  : [],
+	"outputs" : [],
+	"title"   : None,
+	"format"  : "html",
+	"search"  : False,
+	"embed"   : "json",
+}
+
 # A mapping of file extensions (without the dot) and driver names
 # to the canonical driver name
 DRIVERS_EXT = {
@@ -79,6 +90,16 @@ DRIVERS_EXT = {
 	# ".rst"  : "rst",
 }
 
+# A mapping of output formats to their file extension
+FORMATS_EXT = {
+	"html"    : "html",
+	"json"    : "json",
+	"js"      : "js",
+	"compact" : "json",
+	"split"   : None,
+	"sqlite"  : "sqlite",
+}
+
 # The mapping between
 DRIVERS = {
 	"python" : "smalldoc.drivers.py.PythonDriver",
@@ -94,13 +115,37 @@ def run( args, stdout=sys.stdout, interactive=True ):
 	oparser = OptionParser(prog="smalldoc", description=DESCRIPTION,
 	usage=USAGE, version="Smalldoc " + __version__)
 	oparser.add_option("-o", "--output", action="append", dest="output", default=[],
-		help="Outputs the documentation to the given file (format will be detected based on extension)")
-	oparser.add_option("-f", "--format", dest="format", default="html", choices=("json", "html", "js"),
+		help="Outputs the documentation to the given file (format will be detected based on extension), or to the given directory when it ends with a slash")
+	oparser.add_option("-f", "--format", dest="format", default="html", choices=tuple(FORMATS_EXT.keys()),
 		help="Specifies the output format, used when format cannot be guessed from output.")
 	oparser.add_option("-L", "--library", action="append", dest="path",
 		help="Adds the given path as a source of modules/libraries")
 	oparser.add_option("-t", "--title", dest="title",
 		help="Title for the generated documentation")
+	oparser.add_option("-C", "--cache", dest="cache",
+		help="Caches the parsed elements in the given directory, so that unchanged inputs are not parsed again")
+	oparser.add_option("-j", "--jobs", dest="jobs", type="int", default=1,
+		help="Parses the inputs using the given number of worker processes, and writes the outputs using as many threads")
+	oparser.add_option("-e", "--embed", dest="embed", default="json", choices=("json", "compact"),
+		help="Specifies the data embedded in HTML/JS outputs: json (the default, streamed) or compact (smaller, but slower to write)")
+	oparser.add_option("-s", "--search", action="store_true", dest="search", default=False,
+		help="Builds a search index, embedded in HTML/JS outputs and written as a .search.json file next to JSON outputs")
+	oparser.add_option("-w", "--watch", action="store_true", dest="watch", default=False,
+		help="Watches the inputs and regenerates the outputs when one of them changes")
+	oparser.add_option("-p", "--profile", dest="profile",
+		help="Records the time spent in each stage and input, writing the JSON report to the given file and a summary to stderr")
+	oparser.add_option("-c", "--compile", action="store_true", dest="compile", default=False,
+		help="Uses the full compiler for drivers that support it (Sugar) instead of a declaration-only parse")
+	oparser.add_option("-d", "--daemon", dest="daemon", metavar="[HOST:]PORT",
+		help="Keeps the documentation in memory and serves it with an HTTP/JSON API on the given address, updating it when the inputs change")
+	oparser.add_option("-z", "--compress", dest="compress", default="",
+		help="Writes compressed siblings of the output files, given as a comma-separated list of gz, zst and br (zst requires the zstandard module, and br the brotli module)")
+	oparser.add_option("-H", "--hash", action="store_true", dest="hashed", default=False,
+		help="Includes the hash of their content in the names of the output files, which are listed in the manifest")
+	oparser.add_option("-m", "--manifest", dest="manifest",
+		help="Writes the manifest of the output files (path, hash, size and compressed siblings) to the given file, defaulting to smalldoc.manifest.json next to the outputs with --hash")
+	oparser.add_option("-b", "--batch", dest="batch", metavar="MANIFEST",
+		help="Builds all the documentation sets listed in the given JSON manifest in this process (or in the worker processes given with -j)")
 	# We parse the options and arguments
 	options, args = oparser.parse_args(args=args)
 	# We modify the sys.path
@@ -108,22 +153,87 @@ def run( args, stdout=sys.stdout, interactive=True ):
 		options.path.reverse()
 		for arg in options.path:
 			sys.path.insert(0, arg)
+	if options.batch:
+		return batch(options.batch, options)
 	documenter = Documenter()
+	# Compiled and skimmed parses produce different elements, and are
+	# cached separately.
+	cache      = Cache(options.cache, __version__ + ("+compile" if options.compile else "")) if options.cache else None
+	renders    = RenderCache(path=os.path.join(options.cache, "render.json") if options.cache else None, version=__version__)
+	profiler   = None
+	if options.profile:
+		from .profiler import Profiler
+		profiler = documenter.profiler = Profiler()
 	# The lazy map of drivers, create as they're needed
 	drivers    = {}
 	def get_driver( name, drivers=drivers ):
 		"""Lazily creates the drivers with the given name."""
 		if name not in drivers:
-			symbol_name = DRIVERS[name]
-			module_name, class_name = symbol_name.rsplit(".", 1)
-			# Python __import__ does not return the imported symbol but its
-			# root module, so we need to traverse it.
-			path          = symbol_name.split(".")
-			driver_class  = functools.reduce(lambda a,b:getattr(a, b), path[1:], __import__(module_name))
-			driver        = driver_class(documenter, options.path, logger=logging)
-			drivers[name] = driver
+			drivers[name] = create_driver(name, documenter, options.path, dict(compile=options.compile))
+			drivers[name].profiler    = profiler
+			drivers[name].renderCache = renders
 		return drivers[name]
-	# And now document the module
+	# We collect the inputs to be documented
+	inputs, outputs = collect(args)
+	options.output += outputs
+	# And now document the inputs, either in worker processes or serially,
+	# keeping track of the elements produced by each input.
+	sources = {}
+	if options.jobs > 1 and len(inputs) > 1:
+		import multiprocessing
+		pool = multiprocessing.Pool(min(options.jobs, len(inputs)), _initWorker, (options.path, options.cache, bool(profiler), dict(compile=options.compile)))
+		try:
+			# When compiling, each worker gets a chunk of the inputs which is
+			# prepared together, otherwise the inputs are given one by one.
+			count  = min(options.jobs, len(inputs)) if options.compile else len(inputs)
+			chunks = [inputs[i * len(inputs) // count:(i + 1) * len(inputs) // count] for i in range(count)]
+			# The results are returned in the same order as the inputs, which
+			# guarantees the same output as a serial run.
+			results = [_ for chunk in pool.map(_parseChunk, chunks, chunksize=1) for _ in chunk]
+			for job, (elements, report, added) in zip(inputs, results):
+				sources[job] = [documenter.addElement(Element.fromJSON(_)) for _ in elements]
+				renders.merge(added)
+				if report:
+					profiler.merge(report)
+		finally:
+			pool.close()
+			pool.join()
+	else:
+		if options.compile:
+			prepare(get_driver, inputs, cache)
+		for job in inputs:
+			sources[job] = parse(documenter, get_driver, job[0], job[1], cache)
+	if renders.added:
+		renders.save()
+	# We resolve the references between elements
+	documenter.resolve()
+	if args:
+		# And finally, we write the output
+		title   = options.title or "API"
+		outputs = options.output or ([] if options.daemon else ["-"])
+		def output():
+			write(documenter, outputs, options.format, options.search, stdout, options.jobs, getArtifacts(options), options.embed)
+		if outputs:
+			output()
+		if profiler:
+			with open(options.profile, "w") as f:
+				json.dump(profiler.toJSON(), f, indent=1)
+			sys.stderr.write(profiler.summary() + "\n")
+		if options.daemon:
+			serve(documenter, get_driver, sources, options.daemon, cache, output if outputs else None)
+		elif options.watch:
+			watch(documenter, get_driver, sources, cache, output)
+	elif interactive:
+		# If there was no argument, we print the help
+		oparser.print_help()
+	return documenter
+
+def collect( args ):
+	"""Returns the `(inputs, outputs)` given as arguments, inputs being
+	`(driver, path)` couples. The driver is inferred from the file
+	extension, unless the path does not exist and is like `PATH@DRIVER`."""
+	inputs  = []
+	outputs = []
 	for arg in args:
 		driver = DRIVERS_EXT.get(os.path.splitext(arg)[1][1:])
 		# If the path does not exist and is like PATH@DRIVER
@@ -137,30 +247,357 @@ def run( args, stdout=sys.stdout, interactive=True ):
 				arg = arg[:i]
 		# We infer the driver from the file extension
 		if driver == "output":
-			options.output.append(arg)
+			outputs.append(arg)
 		elif driver in DRIVERS:
-			get_driver(driver).parse(arg)
+			inputs.append((driver, arg))
 		elif driver:
 			logging.error("Driver not found: `{0}`".format(driver))
 		else:
 			logging.error("No driver defined for: `{0}`".format(arg))
-	if args:
-		# And finally, we write the output
-		title = options.title or "API"
-		for o in options.output or ("-"):
-			ext = os.path.splitext(o)[1][1:]
-			f = ext if ext in ("html", "json", "js") else options.format
+	return inputs, outputs
+
+def create_driver( name, documenter, path=None, options=None ):
+	"""Creates an instance of the driver with the given name, bound to
+	the given documenter and configured with the given options."""
+	symbol_name = DRIVERS[name]
+	module_name, class_name = symbol_name.rsplit(".", 1)
+	# Python __import__ does not return the imported symbol but its
+	# root module, so we need to traverse it.
+	path_names   = symbol_name.split(".")
+	driver_class = functools.reduce(lambda a,b:getattr(a, b), path_names[1:], __import__(module_name))
+	return driver_class(documenter, path, logger=logging, options=options)
+
+def parse( documenter, get_driver, driver, path, cache=None ):
+	"""Parses the given `path` with the driver named `driver`, adding the
+	resulting elements to the `documenter`. When a `cache` is given, the
+	elements are loaded from it if the file did not change. Returns the
+	list of added elements."""
+	key   = cache.key(path, driver) if cache and os.path.isfile(path) else None
+	entry = cache.get(key) if key else None
+	start = len(documenter.elements)
+	if entry is not None:
+		with documenter.profile("cache", path):
+			for _ in entry:
+				documenter.addElement(Element.fromJSON(_))
+	else:
+		with documenter.profile("parse:" + driver, path):
+			# Sources that changed since the previous parse are reopened
+			parser = get_driver(driver)
+			parser.sources.refresh()
+			parser.parse(path)
+		if key:
+			cache.set(key, [_.toJSON() for _ in documenter.elements[start:]])
+	return documenter.elements[start:]
+
+def prepare( get_driver, inputs, cache=None ):
+	"""Passes the `(driver, path)` inputs that are not in the `cache` to
+	the `prepare` method of their driver, so that they can be processed
+	together."""
+	paths = {}
+	for driver, path in inputs:
+		key = cache.key(path, driver) if cache and os.path.isfile(path) else None
+		if not key or cache.get(key) is None:
+			paths.setdefault(driver, []).append(path)
+	for driver in paths:
+		get_driver(driver).prepare(paths[driver])
+
+def getArtifacts( options ):
+	"""Returns the `artifacts` options of `write` for the given command
+	line options, or `None` when the files are written as-is."""
+	compress = [_.strip() for _ in (options.compress or "").split(",") if _.strip()]
+	if not (compress or options.hashed or options.manifest):
+		return None
+	from .artifacts import COMPRESSIONS, getAvailableCompressions
+	available = getAvailableCompressions()
+	for _ in compress:
+		if _ not in COMPRESSIONS:
+			logging.error("Unsupported compression: `{0}`".format(_))
+		elif _ not in available:
+			logging.warning("Compression `{0}` is not available, its module is not installed".format(_))
+	return dict(
+		compress = [_ for _ in compress if _ in available],
+		hashed   = options.hashed,
+		manifest = options.manifest,
+	)
+
+def write( documenter, outputs, format, search=False, stdout=sys.stdout, jobs=1, artifacts=None, embed="json" ):
+	"""Writes the documenter to each of the given outputs, `-` being the
+	`stdout`. The format is guessed from the output extension, defaulting
+	to the given `format`. The search index, and the model when several
+	outputs need the same serialization, are serialized once and then
+	copied to each output, other outputs are streamed. Files are written
+	by up to `jobs` threads. The HTML and JS outputs embed the data of the
+	`embed` kind (`json` or `compact`).
+
+	The `artifacts` options (see `getArtifacts`) write the files with
+	their compressed siblings (`compress`), with content-hashed names
+	(`hashed`) and list them in a `manifest`."""
+	index = None
+	if search:
+		from .search import SearchIndex
+		index = SearchIndex().build(documenter)
+		index = index.write(io.StringIO()).getvalue()
+	# We list the `(output, format)` to write first, so that each
+	# serialization is only done if it is needed, and only once.
+	targets = []
+	for o in outputs:
+		ext = os.path.splitext(o)[1][1:]
+		f = format if FORMATS_EXT[format] == ext else ext if ext in FORMATS_EXT else format
+		if f == "split" or o.endswith(os.sep) or os.path.isdir(o):
 			if o == "-":
-				o = stdout
-				documenter.write(o, f)
+				logging.error("The split format requires an output directory")
 			else:
-				with open(o, "w") as s:
-					documenter.write(s, f)
-	elif interactive:
-		# If there was no argument, we print the help
-		oparser.print_help()
+				targets.append((o, "split"))
+		elif f == "sqlite" and o == "-":
+			logging.error("The sqlite format requires an output file")
+		else:
+			targets.append((o, f))
+	# Only the data shared by several targets is buffered, the others
+	# stream the model to their output.
+	def kind_of( f ):
+		return embed if f in ("html", "js") else FORMATS_DATA[f]
+	kinds = [kind_of(f) for o, f in targets if f in FORMATS_DATA]
+	data  = {}
+	for kind in set(kinds):
+		if kinds.count(kind) > 1:
+			data[kind] = documenter.serialize(kind)
+	written = {}
+	def open_target( path ):
+		if not artifacts:
+			return open(path, "w")
+		from .artifacts import Artifact
+		# Artifacts are keyed by absolute path, the manifest listing them
+		# relative to the output root.
+		artifact = written[os.path.abspath(path)] = Artifact(path, artifacts["compress"], artifacts["hashed"])
+		return artifact
+	def write_target( target ):
+		o, f = target
+		if f == "split":
+			documenter.writeSplit(o, index)
+		elif f == "sqlite":
+			documenter.writeSQLite(o)
+		elif o == "-":
+			documenter.write(stdout, f, index, data.get(kind_of(f)), kind_of(f))
+		else:
+			with open_target(o) as s:
+				documenter.write(s, f, index, data.get(kind_of(f)), kind_of(f))
+			if index and FORMATS_EXT[f] == "json":
+				with open_target(os.path.splitext(o)[0] + ".search.json") as s:
+					s.write(index)
+	if jobs > 1 and len(targets) > 1:
+		from multiprocessing.pool import ThreadPool
+		pool = ThreadPool(min(jobs, len(targets)))
+		try:
+			pool.map(write_target, targets)
+		finally:
+			pool.close()
+			pool.join()
+	else:
+		for target in targets:
+			write_target(target)
+	manifest = artifacts["manifest"] if artifacts else None
+	if not manifest and artifacts and artifacts["hashed"] and written:
+		# The hashed names can only be known from the manifest, which is
+		# written in the common directory of the outputs.
+		manifest = os.path.join(os.path.commonpath([os.path.dirname(_) for _ in written]), "smalldoc.manifest.json")
+	if manifest:
+		from .artifacts import writeManifest
+		writeManifest(manifest, written)
+	return documenter
+
+def watch( documenter, get_driver, sources, cache=None, callback=None, lock=None ):
+	"""Watches the `(driver, path)` inputs listed in `sources`, replacing
+	the elements of an input in the documenter when it changes and then
+	invoking the `callback`. The drivers stay resident, so that only the
+	changed input is parsed again. The documenter is only modified
+	within the given `lock` context, if any. This only returns on
+	interruption."""
+	from .watch import Watcher
+	lock = lock or contextlib.nullcontext()
+	def on_change( paths ):
+		for job in [_ for _ in sources if _[1] in paths]:
+			driver, path = job
+			logging.info("Updating: {0}".format(path))
+			scratch = Documenter()
+			d       = get_driver(driver)
+			d.documenter = scratch
+			try:
+				elements = parse(scratch, get_driver, driver, path, cache)
+			except Exception as e:
+				logging.error("Cannot parse `{0}`: {1}".format(path, e))
+				continue
+			finally:
+				d.documenter = documenter
+			with lock:
+				sources[job] = documenter.replaceElements(sources[job], elements)
+		with lock:
+			documenter.resolve()
+		if callback:
+			callback()
+	try:
+		Watcher([_[1] for _ in sources], on_change).run()
+	except KeyboardInterrupt:
+		pass
 	return documenter
 
+def serve( documenter, get_driver, sources, address, cache=None, callback=None ):
+	"""Serves the documenter with the HTTP/JSON API of `smalldoc.server` on
+	the given `[HOST:]PORT` address, while watching the inputs listed in
+	`sources` in a background thread. The `callback` is invoked after
+	each update. This only returns on interruption."""
+	import threading
+	from .server import Server
+	host, _, port = address.rpartition(":")
+	server = Server(documenter, (host or "127.0.0.1", int(port)))
+	def on_update():
+		server.update()
+		if callback:
+			callback()
+	watcher = threading.Thread(target=watch, args=(documenter, get_driver, sources, cache, on_update, server.lock.writing()))
+	watcher.daemon = True
+	watcher.start()
+	logging.info("Serving {0} elements on http://{1}:{2}".format(len(documenter.ids), *server.address))
+	try:
+		server.run()
+	except KeyboardInterrupt:
+		pass
+	return documenter
+
+def batch( manifest, options ):
+	"""Builds the documentation sets listed in the given JSON `manifest`,
+	which is a list of jobs like `{"name", "inputs", "outputs", "title",
+	"format", "search", "embed"}` (see `BATCH_JOB`), relative paths being
+	relative to the manifest. The jobs are run in this process, or in
+	`options.jobs` worker processes, which share their drivers, templates
+	and parsed inputs between jobs. Returns the list of `(name, elements,
+	error)` results."""
+	with open(manifest) as f:
+		jobs = json.load(f)
+	base = os.path.dirname(os.path.abspath(manifest))
+	def normalize( i, job ):
+		res = dict(BATCH_JOB)
+		res.update(job)
+		res["name"]    = res["name"] or str(i)
+		res["inputs"]  = [os.path.join(base, _) if os.path.exists(os.path.join(base, _)) else _ for _ in res["inputs"]]
+		res["outputs"] = [_ if _ == "-" else os.path.join(base, _) for _ in res["outputs"]]
+		return res
+	jobs    = [normalize(i, _) for i, _ in enumerate(jobs.get("jobs", ()) if isinstance(jobs, dict) else jobs)]
+	init    = (options.path, options.cache, False, dict(compile=options.compile))
+	results = []
+	# The renderings added by each job are saved by this process, whether
+	# the jobs run in workers or not.
+	renders = RenderCache(path=os.path.join(options.cache, "render.json") if options.cache else None, version=__version__)
+	if options.jobs > 1 and len(jobs) > 1:
+		import multiprocessing
+		pool = multiprocessing.Pool(min(options.jobs, len(jobs)), _initBatchWorker, init)
+		try:
+			# Results follow the order of the manifest, like a serial run
+			for name, count, error, added in pool.imap(_batchJob, jobs):
+				results.append((name, count, error))
+				renders.merge(added)
+		finally:
+			pool.close()
+			pool.join()
+	else:
+		_initBatchWorker(*init)
+		WORKER["renders"] = renders
+		for name, count, error, added in (_batchJob(_) for _ in jobs):
+			results.append((name, count, error))
+			renders.merge(added)
+	if renders.added:
+		renders.save()
+	for name, count, error in results:
+		if error:
+			logging.error("Job `{0}` failed: {1}".format(name, error))
+		else:
+			logging.info("Job `{0}`: {1} elements".format(name, count))
+	return results
+
+# -----------------------------------------------------------------------------
+#
+# WORKERS
+#
+# -----------------------------------------------------------------------------
+
+# The state of a worker process, as set by `_initWorker`
+WORKER = {}
+
+def _initWorker( path, cache, profile=False, options=None ):
+	"""Initializes a worker process, making sure the library paths are
+	available even when the process was not forked."""
+	for _ in reversed(path or ()):
+		if _ not in sys.path:
+			sys.path.insert(0, _)
+	WORKER["path"]    = path
+	WORKER["options"] = options
+	WORKER["cache"]   = Cache(cache, __version__ + ("+compile" if (options or {}).get("compile") else "")) if cache else None
+	WORKER["drivers"] = {}
+	WORKER["profile"] = profile
+	# Workers only read the persisted renderings: the new ones are returned
+	# with each job and saved by the main process.
+	WORKER["renders"] = RenderCache(path=os.path.join(cache, "render.json") if cache else None, version=__version__)
+
+def _parseJob( job ):
+	"""Parses the given `(driver, path)` job in a fresh documenter and
+	returns the JSON of the resulting elements along with the profiler
+	report, if profiling, and the renderings added by the job. Drivers
+	are kept for the lifetime of the worker and bound to the documenter
+	of each job."""
+	name, path = job
+	documenter = Documenter()
+	if WORKER["profile"]:
+		from .profiler import Profiler
+		documenter.profiler = Profiler()
+	parse(documenter, _getWorkerDrivers(documenter), name, path, WORKER["cache"])
+	report = documenter.profiler.toJSON() if documenter.profiler else None
+	return [_.toJSON() for _ in documenter.elements], report, WORKER["renders"].takeAdded()
+
+def _parseChunk( jobs ):
+	"""Prepares the given `(driver, path)` jobs together (see `prepare`)
+	and returns the result of `_parseJob` for each of them."""
+	if (WORKER["options"] or {}).get("compile"):
+		prepare(_getWorkerDrivers(Documenter()), jobs, WORKER["cache"])
+	return [_parseJob(_) for _ in jobs]
+
+def _initBatchWorker( *args ):
+	"""Initializes a worker process like `_initWorker`, the parsed elements
+	being also kept in memory so that inputs shared by several jobs are
+	only parsed once."""
+	_initWorker(*args)
+	WORKER["cache"] = MemoryCache(WORKER["cache"], __version__)
+
+def _batchJob( job ):
+	"""Builds the given batch job, returning `(name, elements, error,
+	added)`, where `elements` is the number of documented elements and
+	`added` the renderings added by the job."""
+	try:
+		documenter = Documenter()
+		get_driver = _getWorkerDrivers(documenter)
+		inputs, _  = collect(job["inputs"])
+		if (WORKER["options"] or {}).get("compile"):
+			prepare(get_driver, inputs, WORKER["cache"])
+		for driver, path in inputs:
+			parse(documenter, get_driver, driver, path, WORKER["cache"])
+		documenter.resolve()
+		write(documenter, job["outputs"] or ("-",), job["format"], job["search"], embed=job["embed"])
+		return job["name"], len(documenter.ids), None, WORKER["renders"].takeAdded()
+	except Exception as e:
+		return job["name"], 0, "{0}: {1}".format(e.__class__.__name__, e), WORKER["renders"].takeAdded()
+
+def _getWorkerDrivers( documenter ):
+	"""Returns a `get_driver` function for the given documenter. Drivers are
+	kept for the lifetime of the worker and bound to the given
+	documenter."""
+	drivers = WORKER["drivers"]
+	def get_driver( name ):
+		if name not in drivers:
+			drivers[name] = create_driver(name, documenter, WORKER["path"], WORKER["options"])
+		drivers[name].documenter  = documenter
+		drivers[name].profiler    = documenter.profiler
+		drivers[name].renderCache = WORKER["renders"]
+		return drivers[name]
+	return get_driver
+
 if __name__ == "__main__":
 	run(sys.argv[1:])
 
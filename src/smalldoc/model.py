@@ -9,7 +9,11 @@
 # Last modification : 2016-12-21
 # -----------------------------------------------------------------------------
 
-import os, json
+import os, io, re, json
+from   array             import array
+from   smalldoc.profiler import NO_STAGE
+
+dumps = json.dumps
 
 KEY_DOCUMENT        = "document"
 KEY_FILE            = "file"
@@ -35,6 +39,7 @@ MOD_INHERITED       = "inherited"
 
 REL_EXTENDS         = "extends"
 REL_ARGUMENTS       = "arguments"
+REL_DECORATORS      = "decorators"
 REL_SLOT            = "defines"
 REL_DEFINED         = "defined in"
 REL_SOURCE          = "source"
@@ -42,6 +47,10 @@ REL_PARENT          = "parent"
 REL_NEXT            = "next"
 REL_PREVIOUS        = "previous"
 
+# The relations which arguments reference other elements by id or name,
+# and that are resolved by `Documenter.resolve`.
+REL_REFERENCES      = (REL_EXTENDS, REL_PARENT, REL_DEFINED, REL_NEXT, REL_PREVIOUS)
+
 SPECIAL_ATTRIBUTES = {
 	"__init__"    : "constructor",
 	"__cmp__"     : "compare to",
@@ -67,9 +76,95 @@ COMPACT_NAMES = {
 	"representation": "re",
 	"root"          : "ro",
 	"title"         : "t",
-	"undocumented"  : "u"
+	"undocumented"  : "u",
+	# Keys used by the compact model format
+	"format"        : "f",
+	"strings"       : "st",
+	"elements"      : "el",
+	"id"            : "i",
+	"type"          : "ty",
+	"tags"          : "tg",
+	"parent"        : "p",
+	"documentation" : "do",
+	"source"        : "so",
+	"range"         : "ra",
+	"children"      : "c",
+	"relations"     : "rl",
+}
+
+COMPACT_FORMAT = "smalldoc-compact-1"
+
+# The data (see `Documenter.serialize`) written by each output format. The
+# pages embed the streamed JSON by default, and can embed the smaller
+# compact data instead (see `Documenter.write`), which the viewer decodes.
+FORMATS_DATA   = {
+	"json"    : "json",
+	"compact" : "compact",
+	"html"    : "json",
+	"js"      : "json",
 }
 
+RE_SUMMARY     = re.compile(r"<p[^>]*>.*?</p>", re.S)
+RE_SHARD_NAME  = re.compile(r"[^\w\.\-]+")
+
+TEMPLATES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "templates")
+# The contents of the template files, read once per process by `getTemplate`
+TEMPLATES      = {}
+
+def getTemplate( name ):
+	"""Returns the contents of the given template file, which is only read
+	on first use, so that writing many documentation sets in the same
+	process does not read the templates again."""
+	text = TEMPLATES.get(name)
+	if text is None:
+		with open(os.path.join(TEMPLATES_PATH, name)) as f:
+			text = TEMPLATES[name] = f.read()
+	return text
+
+def writeSearch( stream, search ):
+	"""Writes the given search index, or its already serialized JSON, to
+	the given stream."""
+	if isinstance(search, str):
+		stream.write(search)
+	else:
+		search.write(stream)
+	return stream
+
+# The markers of `smalldoc.html` at which the assets are inlined
+SHELL_MARKERS  = ('<link href="smalldoc.css" rel="stylesheet" />', ' src="html-5.0.9.js">', ' src="smalldoc.js">', 'smalldoc.load("/api.json")')
+# The `(prefix, suffix)` of each output format, assembled by `getShell`
+SHELLS         = {}
+
+def getShell( format ):
+	"""Returns the `(prefix, suffix)` of the given output format (`html`,
+	`js` or `split`, which has an empty suffix), in between which the
+	data is written. Shells are assembled from the templates once per
+	process, so that writing an output only copies them to the stream."""
+	shell = SHELLS.get(format)
+	if shell is None:
+		shell = SHELLS[format] = _assembleShell(format)
+	return shell
+
+def _assembleShell( format ):
+	jsh = getTemplate("html-5.0.9.js")
+	jss = getTemplate("smalldoc.js")
+	if format == "js":
+		return ("smalldoc.DATA=", jsh + jss + "smalldoc.loadCSS();smalldoc.load('api.json');smalldoc.setup();")
+	# The page template is cut at its markers, so that the (much larger)
+	# assets are never searched nor copied more than once.
+	parts = []
+	rest  = getTemplate("smalldoc.html")
+	for marker in SHELL_MARKERS:
+		part, _, rest = rest.partition(marker)
+		parts.append(part)
+	head = parts[0] + "<style>" + getTemplate("smalldoc.css") + "</style>" + parts[1] + ">" + jsh + parts[2] + ">" + jss
+	if format == "html":
+		return (head + ";", ");" + parts[3] + SHELL_MARKERS[3] + rest)
+	elif format == "split":
+		return (head + parts[3] + 'smalldoc.load("manifest.json")' + rest, "")
+	else:
+		raise ValueError("No shell for format: {0}".format(format))
+
 
 # -----------------------------------------------------------------------------
 #
@@ -86,9 +181,19 @@ class Element(object):
 	Its properties and API were carefully selected in order to avoid having
 	to create one subclass per type, and make sure the data could be
 	serialized to a consistent JSON format that can be easily processed
-	using JavaScript."""
+	using JavaScript.
+
+	As models can have millions of elements, elements use `__slots__` and
+	their `children` list is only allocated when the first child is
+	added (it is `None` otherwise). The relations of the elements indexed
+	by a `Documenter` are stored in its `Edges` table, `relations` being
+	a view of them. Other elements keep their relations in a list until
+	they are indexed, so that discarded elements are not kept in the
+	table."""
 
-	def __init__( self, id=None, name=None, type=None, parent=None, tags=None, documentation=None, representation=None, source=None, range=None ):
+	__slots__ = ("id", "name", "type", "tags", "parent", "documentation", "representation", "source", "range", "children", "_edges", "_node", "_relations")
+
+	def __init__( self, id=None, name=None, type=None, parent=None, tags=None, documentation=None, representation=None, source=None, range=None, edges=None ):
 		self.id             = id
 		self.name           = name
 		self.type           = type
@@ -98,15 +203,45 @@ class Element(object):
 		self.representation = representation
 		self.source         = source
 		self.range          = range
-		self.children       = []
-		self.relations      = []
+		self.children       = None
+		self._edges         = edges
+		self._node          = -1
+		self._relations     = None
+
+	@property
+	def relations( self ):
+		"""The `[verb, object…]` relations of this element, or `None` when
+		it has none. This is a copy, relations are added with
+		`addRelation`."""
+		return self.getRelations() or None
+
+	def getRelations( self, *verbs ):
+		"""Returns the relations of this element with any of the given
+		verbs, or all its relations when no verb is given."""
+		if self._node >= 0:
+			return self._edges.get(self, verbs)
+		else:
+			return [list(_) for _ in self._relations or () if not verbs or _[0] in verbs]
+
+	def _getRelationsJSON( self ):
+		"""Returns the relations of this element, elements being replaced
+		by their id."""
+		if self._node >= 0:
+			return self._edges.get(self, (), True)
+		else:
+			return [[_.id if isinstance(_,Element) else _ for _ in r] for r in self._relations or ()]
 
 	def addRelation( self, verb, *objects ):
-		self.relations.append([verb] + list(objects))
+		if self._node >= 0:
+			self._edges.add(self, verb, objects)
+		else:
+			if self._relations is None:
+				self._relations = []
+			self._relations.append([verb] + list(objects))
 		return self
 
 	def setSlot( self, name, value ):
-		self.children.append((name, value))
+		self.addChild(name, value)
 		if value:
 			value.addRelation(REL_DEFINED, self)
 			value.addRelation(REL_SLOT, name, value)
@@ -116,16 +251,40 @@ class Element(object):
 		return self
 
 	def addChild( self, name, element ):
+		if self.children is None:
+			self.children = []
 		self.children.append((name, element))
 		return self
 
+	@classmethod
+	def fromJSON( cls, data ):
+		"""Creates an element from the given `data`, as returned by `toJSON`.
+		Element references (parent, relations) are restored as ids, which
+		serialize back to the exact same JSON."""
+		element = cls(
+			id             = data.get("id"),
+			name           = data.get("name"),
+			type           = data.get("type"),
+			tags           = data.get("tags"),
+			parent         = data.get("parent"),
+			documentation  = data.get("documentation"),
+			representation = data.get("representation"),
+			source         = data.get("source"),
+			range          = data.get("range"),
+		)
+		for name, value in data.get("children") or ():
+			element.addChild(name, cls.fromJSON(value) if isinstance(value, dict) else value)
+		for relation in data.get("relations") or ():
+			element.addRelation(*relation)
+		return element
+
 	def toJSON( self ):
 		return dict((k,v) for k,v in dict(
 			id             = self.id,
 			name           = self.name,
 			type           = self.type,
 			tags           = self.tags,
-			parent         = self.parent.id if self.parent else None,
+			parent         = self.parent.id if isinstance(self.parent, Element) else self.parent,
 			documentation  = self.documentation,
 			representation = self.representation,
 			source         = self.source,
@@ -134,11 +293,355 @@ class Element(object):
 				_[0],
 				_[1].toJSON() if isinstance(_[1],Element) else _[1],
 			) for _ in self.children or () ],
-			relations     = [[
-				_.id if isinstance(_,Element) else _ for _ in r
-			] for r in self.relations or ()]
+			relations      = self._getRelationsJSON(),
 		).items() if v)
 
+	def writeJSON( self, stream ):
+		"""Writes the JSON representation of this element to the given stream.
+		The output is the same as `json.dumps(self.toJSON())`, but it is
+		produced without building the intermediate dictionaries."""
+		write = stream.write
+		sep   = "{"
+		for key, value in (
+			("id",             self.id),
+			("name",           self.name),
+			("type",           self.type),
+			("tags",           self.tags),
+			("parent",         self.parent.id if isinstance(self.parent, Element) else self.parent),
+			("documentation",  self.documentation),
+			("representation", self.representation),
+			("source",         self.source),
+			("range",          self.range),
+		):
+			if value:
+				write(sep + '"' + key + '": ' + dumps(value))
+				sep = ", "
+		if self.children:
+			write(sep + '"children": [')
+			sep = ", "
+			for i, (name, value) in enumerate(self.children):
+				write(("[" if i == 0 else ", [") + dumps(name) + ", ")
+				if isinstance(value, Element):
+					value.writeJSON(stream)
+				else:
+					write(dumps(value))
+				write("]")
+			write("]")
+		relations = self._getRelationsJSON()
+		if relations:
+			write(sep + '"relations": ' + dumps(relations))
+			sep = ", "
+		write("{}" if sep == "{" else "}")
+		return stream
+
+# -----------------------------------------------------------------------------
+#
+# EDGES
+#
+# -----------------------------------------------------------------------------
+
+class Edges(object):
+	"""The relations of the elements of a documenter, stored as a table of
+	edges in typed array columns instead of a list of lists per element.
+
+	An edge is its `source` element, its `verb` (interned in `verbs`) and
+	its `target`, which is its first argument, the others being stored
+	in `arguments` from the `rest` offset of the edge. Arguments are
+	references: elements are numbered in `nodes`, references from `0`
+	being node indexes, other values are stored in `values`, which index
+	`i` is referenced as `-2 - i`, and `-1` stands for no argument.
+
+	The edges of an element are chained from its `first` edge by `next`,
+	in the order they were added, and a reverse index of the edges by
+	target is built on demand by `getReferencing`. Removed edges have a
+	`source` of `-1`, and are dropped by `compact`."""
+
+	def __init__( self ):
+		self.verbs     = []
+		self._verbs    = {}
+		self._pending  = None
+		self._reset()
+
+	def _reset( self ):
+		self.nodes     = []
+		self.values    = []
+		# The columns of the nodes
+		self.first     = array("i")
+		self.last      = array("i")
+		# The columns of the edges
+		self.source    = array("i")
+		self.verb      = array("H")
+		self.target    = array("i")
+		self.rest      = array("i")
+		self.next      = array("i")
+		self.arguments = array("i")
+		self.dead      = 0
+		self._reverse  = None
+
+	def __len__( self ):
+		return len(self.source)
+
+	def bind( self, element ):
+		"""Returns the node of the given element, moving it (and its
+		relations) to this table if it was not already. The elements
+		referenced by these relations are bound as well: they are numbered
+		first and their relations are moved from a worklist afterwards, so
+		that long chains of elements (like `next` sections) do not
+		recurse."""
+		if element._edges is self and element._node >= 0:
+			return element._node
+		if element._node < 0:
+			relations, element._relations = element._relations or (), None
+		else:
+			relations = element._edges.get(element)
+		node           = len(self.nodes)
+		element._edges = self
+		element._node  = node
+		self.nodes.append(element)
+		self.first.append(-1)
+		self.last.append(-1)
+		if not relations:
+			pass
+		elif self._pending is not None:
+			self._pending.append((element, relations))
+		else:
+			pending = self._pending = [(element, relations)]
+			try:
+				i = 0
+				while i < len(pending):
+					element, relations = pending[i]
+					for _ in relations:
+						self.add(element, _[0], _[1:])
+					i += 1
+			finally:
+				self._pending = None
+		return node
+
+	def unbind( self, element ):
+		"""Removes the edges of the given element, which then keeps its
+		relations in a list."""
+		if element._edges is not self:
+			return element
+		if element._node >= 0:
+			element._relations = self.get(element) or None
+			edge = self.first[element._node]
+			while edge != -1:
+				self.source[edge] = -1
+				self.dead        += 1
+				edge              = self.next[edge]
+			self.first[element._node] = self.last[element._node] = -1
+			self._reverse = None
+		element._edges = None
+		element._node  = -1
+		return element
+
+	def add( self, element, verb, objects ):
+		"""Adds an edge with the given verb from the given element to the
+		given objects."""
+		source = element._node if element._edges is self and element._node >= 0 else self.bind(element)
+		v      = self._verbs.get(verb)
+		if v is None:
+			v = self._verbs[verb] = len(self.verbs)
+			self.verbs.append(verb)
+		edge   = len(self.source)
+		self.source.append(source)
+		self.verb.append(v)
+		self.rest.append(len(self.arguments))
+		self.next.append(-1)
+		if objects:
+			self.target.append(self.getReference(objects[0]))
+			for _ in objects[1:]:
+				self.arguments.append(self.getReference(_))
+		else:
+			self.target.append(-1)
+		if self.first[source] == -1:
+			self.first[source] = edge
+		else:
+			self.next[self.last[source]] = edge
+		self.last[source] = edge
+		self._reverse     = None
+		return edge
+
+	def getReference( self, value, bind=True ):
+		"""Returns the reference to the given value. Elements are bound to
+		this table unless `bind` is false, in which case the elements of
+		other tables are stored as values."""
+		if isinstance(value, Element) and (bind or value._edges is self):
+			return value._node if value._edges is self and value._node >= 0 else self.bind(value)
+		self.values.append(value)
+		return -1 - len(self.values)
+
+	def getArguments( self, edge ):
+		"""Returns the arguments of the given edge."""
+		if self.target[edge] == -1:
+			return []
+		end = self.rest[edge + 1] if edge + 1 < len(self.rest) else len(self.arguments)
+		return [self.getObject(self.target[edge])] + [self.getObject(_) for _ in self.arguments[self.rest[edge]:end]]
+
+	def getValues( self, verbs ):
+		"""Returns the `(edge, position, value)` of the arguments of the
+		edges with any of the given verbs which are values and not
+		elements, like the names of unresolved references."""
+		verbs  = set(self._verbs[_] for _ in verbs if _ in self._verbs)
+		values = self.values
+		last   = len(self.rest) - 1
+		res    = []
+		for edge, v in enumerate(self.verb):
+			if v in verbs and self.source[edge] != -1:
+				t = self.target[edge]
+				if t < -1:
+					res.append((edge, 0, values[-2 - t]))
+				if t != -1:
+					start = self.rest[edge]
+					end   = self.rest[edge + 1] if edge < last else len(self.arguments)
+					for i in range(start, end):
+						t = self.arguments[i]
+						if t < -1:
+							res.append((edge, i - start + 1, values[-2 - t]))
+		return res
+
+	def detach( self, elements, verbs ):
+		"""Replaces the references to the given elements in the edges
+		with any of the given verbs of the other elements by the id
+		(or name) of the referenced element, so that they can be
+		resolved again. Returns the number of replaced references."""
+		nodes = dict((_._node, _) for _ in elements if _._edges is self and _._node >= 0)
+		verbs = set(self._verbs[_] for _ in verbs if _ in self._verbs)
+		last  = len(self.rest) - 1
+		count = 0
+		for edge, v in enumerate(self.verb):
+			source = self.source[edge]
+			if v not in verbs or source == -1 or source in nodes:
+				continue
+			t = self.target[edge]
+			if t in nodes:
+				self.target[edge] = self.getReference(nodes[t].id or nodes[t].name)
+				count += 1
+			if t != -1:
+				end = self.rest[edge + 1] if edge < last else len(self.arguments)
+				for i in range(self.rest[edge], end):
+					if self.arguments[i] in nodes:
+						element           = nodes[self.arguments[i]]
+						self.arguments[i] = self.getReference(element.id or element.name)
+						count += 1
+		if count:
+			self._reverse = None
+		return count
+
+	def getSource( self, edge ):
+		"""Returns the element of the given edge."""
+		return self.nodes[self.source[edge]]
+
+	def setArgument( self, edge, position, value ):
+		"""Replaces the argument at the given position of the given edge."""
+		if position == 0:
+			self.target[edge] = self.getReference(value)
+			self._reverse     = None
+		else:
+			self.arguments[self.rest[edge] + position - 1] = self.getReference(value)
+		return edge
+
+	def getObject( self, reference ):
+		"""Returns the element or value of the given reference."""
+		return self.nodes[reference] if reference >= 0 else self.values[-2 - reference]
+
+	def get( self, element, verbs=(), ids=False ):
+		"""Returns the `[verb, argument…]` relations of the given element
+		with any of the given verbs, or all of them when no verb is
+		given. Elements are replaced by their id when `ids` is true."""
+		if element._edges is not self or element._node < 0:
+			return []
+		verbs     = [self._verbs[_] for _ in verbs if _ in self._verbs] if verbs else None
+		# This is called for each element when the model is written, so the
+		# columns are looked up once.
+		names     = self.verbs
+		nodes     = self.nodes
+		values    = self.values
+		arguments = self.arguments
+		verb      = self.verb
+		target    = self.target
+		rest      = self.rest
+		next      = self.next
+		last      = len(rest) - 1
+		res       = []
+		edge      = self.first[element._node]
+		while edge != -1:
+			v = verb[edge]
+			if verbs is None or v in verbs:
+				t = target[edge]
+				if t == -1:
+					res.append([names[v]])
+				else:
+					r     = [names[v]]
+					start = rest[edge]
+					end   = rest[edge + 1] if edge < last else len(arguments)
+					while True:
+						if t >= 0:
+							r.append(nodes[t].id if ids else nodes[t])
+						else:
+							o = values[-2 - t]
+							r.append(o.id if ids and isinstance(o, Element) else o)
+						if start == end:
+							break
+						t      = arguments[start]
+						start += 1
+					res.append(r)
+			edge = next[edge]
+		return res
+
+	def getReferencing( self, element, verbs=() ):
+		"""Returns the `(element, edge)` of the edges with any of the given
+		verbs (or any verb) which target is the given element, like the
+		subclasses of a class (`REL_PARENT`) or the elements defined in a
+		module (`REL_DEFINED`)."""
+		if element._edges is not self or element._node < 0:
+			return []
+		if self._reverse is None:
+			self._reverse = self._getReverse()
+		offsets, edges = self._reverse
+		verbs = [self._verbs[_] for _ in verbs if _ in self._verbs] if verbs else None
+		node  = element._node
+		return [(self.nodes[self.source[_]], _) for _ in edges[offsets[node]:offsets[node + 1]] if verbs is None or self.verb[_] in verbs]
+
+	def compact( self ):
+		"""Rebuilds the table without its removed edges, the values that are
+		not referenced anymore, nor the nodes of unbound elements."""
+		relations = [
+			(self.nodes[self.source[_]], self.verbs[self.verb[_]], self.getArguments(_))
+			for _ in range(len(self.source)) if self.source[_] != -1
+		]
+		nodes = [_ for _ in self.nodes if _._edges is self]
+		for _ in nodes:
+			_._node = -1
+		self._reset()
+		# The bound elements stay bound, even without edges
+		for _ in nodes:
+			self.bind(_)
+		for element, verb, args in relations:
+			edge = self.add(element, verb, ())
+			# Elements that were unbound since are kept as values
+			args = [self.getReference(_, False) for _ in args]
+			self.target[edge] = args[0] if args else -1
+			self.arguments.extend(args[1:])
+		return self
+
+	def _getReverse( self ):
+		"""Returns the `(offsets, edges)` index of the edges by target, the
+		edges targeting node `i` being `edges[offsets[i]:offsets[i+1]]`."""
+		offsets = array("i", [0]) * (len(self.nodes) + 1)
+		for edge, target in enumerate(self.target):
+			if target >= 0 and self.source[edge] != -1:
+				offsets[target + 1] += 1
+		for i in range(len(self.nodes)):
+			offsets[i + 1] += offsets[i]
+		edges = array("i", [0]) * offsets[-1]
+		fill  = array("i", offsets)
+		for edge, target in enumerate(self.target):
+			if target >= 0 and self.source[edge] != -1:
+				edges[fill[target]] = edge
+				fill[target]       += 1
+		return offsets, edges
+
 # -----------------------------------------------------------------------------
 #
 # DOCUMENTER
@@ -150,24 +653,180 @@ class Documenter(object):
 	wrapped by drivers, which create elements based on a given input."""
 
 	def __init__( self ):
-		self.elements = []
+		self.profiler   = None
+		self.edges      = Edges()
+		self.elements   = []
+		self.ids        = {}
+		self.names      = {}
+		self._indexed   = set()
+		self._inherited = {}
+
+	def profile( self, stage, path=None, detail=None ):
+		"""Returns a context manager recording the time spent in the given
+		stage when the documenter has a `profiler`."""
+		return self.profiler.stage(stage, path, detail) if self.profiler else NO_STAGE
 
 	def addElement( self, element ):
 		assert isinstance(element, Element)
 		self.elements.append(element)
+		self.index(element)
+		return element
+
+	def index( self, element ):
+		"""Registers the given element and the elements slotted in it in the
+		`ids` and `names` indexes, moving their relations to the `edges`
+		table. Elements that are already indexed are skipped, so that this
+		can be called again when slots are added."""
+		stack = [element]
+		while stack:
+			e = stack.pop()
+			if id(e) in self._indexed:
+				continue
+			self._indexed.add(id(e))
+			self.edges.bind(e)
+			if e.id:
+				self.ids[e.id] = e
+			if e.name:
+				self.names.setdefault(e.name, []).append(e)
+			stack.extend(v for _, v in reversed(e.children or ()) if isinstance(v, Element))
 		return element
 
+	def unindex( self, element ):
+		"""Removes the given element and its slotted elements from the
+		indexes and the `edges` table."""
+		stack = [element]
+		while stack:
+			e = stack.pop()
+			if id(e) not in self._indexed:
+				continue
+			self._indexed.discard(id(e))
+			self.edges.unbind(e)
+			if e.id and self.ids.get(e.id) is e:
+				del self.ids[e.id]
+			if e.name and e.name in self.names:
+				named = [_ for _ in self.names[e.name] if _ is not e]
+				if named:
+					self.names[e.name] = named
+				else:
+					del self.names[e.name]
+			stack.extend(v for _, v in e.children or () if isinstance(v, Element))
+		return element
+
+	def replaceElements( self, old, new ):
+		"""Replaces the `old` top-level elements by the `new` ones, which
+		take the position of the first old element (or are appended if
+		there is none). The references of the other elements to the old
+		elements are turned back into ids, so that the next `resolve`
+		links them to the new elements. Returns the new elements."""
+		removed  = set(id(_) for _ in old)
+		position = next((i for i, _ in enumerate(self.elements) if id(_) in removed), len(self.elements))
+		self.edges.detach(self.getDescendants(old), REL_REFERENCES)
+		for _ in old:
+			self.unindex(_)
+		self.elements = [_ for _ in self.elements if id(_) not in removed]
+		self.elements[position:position] = new
+		for _ in new:
+			self.index(_)
+		if self.edges.dead * 2 > len(self.edges):
+			self.edges.compact()
+		self._inherited = {}
+		return new
+
+	def getDescendants( self, elements ):
+		"""Returns the given elements and the elements slotted in them."""
+		res   = []
+		seen  = set()
+		stack = list(elements)
+		while stack:
+			e = stack.pop()
+			if id(e) not in seen:
+				seen.add(id(e))
+				res.append(e)
+				stack.extend(v for _, v in e.children or () if isinstance(v, Element))
+		return res
+
+	def lookup( self, name, scope=None ):
+		"""Returns the element with the given id, or the element with the
+		given name that is the closest to the given `scope` id."""
+		if name in self.ids:
+			return self.ids[name]
+		scope = scope.split(".")[:-1] if scope else []
+		while scope:
+			element = self.ids.get(".".join(scope + [name]))
+			if element:
+				return element
+			scope.pop()
+		candidates = self.names.get(name)
+		return candidates[0] if candidates else None
+
+	def resolve( self ):
+		"""Replaces the ids and names referenced in the `REL_REFERENCES`
+		relations by the corresponding elements. Unresolved references
+		are kept as-is. Returns the number of resolved references."""
+		with self.profile("resolve"):
+			return self._resolve()
+
+	def _resolve( self ):
+		count = 0
+		edges = self.edges
+		for edge, i, value in edges.getValues(REL_REFERENCES):
+			if isinstance(value, str):
+				element = edges.getSource(edge)
+				# Only the elements registered by id are resolved
+				if element.id is None or self.ids.get(element.id) is not element:
+					continue
+				target = self.lookup(value, element.id)
+				if target is not None and target is not element:
+					edges.setArgument(edge, i, target)
+					count += 1
+		self._inherited = {}
+		return count
+
+	def getParents( self, element ):
+		"""Returns the resolved parent elements of the given element."""
+		return [_ for r in element.getRelations(REL_PARENT, REL_EXTENDS) for _ in r[1:] if isinstance(_, Element)]
+
+	def getReferencing( self, element, *verbs ):
+		"""Returns the elements that have a relation with any of the given
+		verbs (or any verb) to the given element, like the subclasses of
+		a class (`REL_PARENT`)."""
+		return [_[0] for _ in self.edges.getReferencing(element, verbs)]
+
+	def getInheritedSlots( self, element ):
+		"""Returns the `(name, value, owner)` slots that the given element
+		inherits from its (resolved) parents, in depth-first,
+		left-to-right order, excluding the slots it overrides. Results are
+		memoized until the next `resolve`."""
+		key = id(element)
+		if key not in self._inherited:
+			defined = set(_[0] for _ in element.children or ())
+			visited = set([key])
+			slots   = []
+			stack   = list(reversed(self.getParents(element)))
+			while stack:
+				parent = stack.pop()
+				if id(parent) in visited:
+					continue
+				visited.add(id(parent))
+				for name, value in parent.children or ():
+					if name not in defined:
+						defined.add(name)
+						slots.append((name, value, parent))
+				stack.extend(reversed(self.getParents(parent)))
+			self._inherited[key] = slots
+		return self._inherited[key]
+
 	def createElement( self, **kwargs ):
-		return Element(**kwargs)
+		return Element(edges=self.edges, **kwargs)
 
 	def createModule( self, name, **kwargs):
-		return self.createElement(type=KEY_MODULE, **kwargs)
+		return self.createElement(type=KEY_MODULE, name=name, **kwargs)
 
 	def createFunction( self, name, **kwargs):
-		return self.createElement(type=KEY_FUNCTION, **kwargs)
+		return self.createElement(type=KEY_FUNCTION, name=name, **kwargs)
 
 	def createClass( self, name, **kwargs):
-		return self.createElement(type=KEY_CLASS, **kwargs)
+		return self.createElement(type=KEY_CLASS, name=name, **kwargs)
 
 	def toJSON( self ):
 		return {"children":[[_.name or _.id, _.toJSON()] for _ in self.elements]}
@@ -175,26 +834,185 @@ class Documenter(object):
 	def toHTML( self ):
 		return {"children":[[_.name or _.id, _.toJSON()] for _ in self.elements]}
 
-	def write( self, stream, format ):
-		templates = os.path.join(os.path.dirname(os.path.abspath(__file__)), "templates")
-		if format == "json":
-			json.dump(self.toJSON(), stream)
+	def writeJSON( self, stream ):
+		"""Writes the same data as `json.dump(self.toJSON(), stream)`, streaming
+		each element to the output instead of building the whole tree
+		in memory."""
+		stream.write('{"children": [')
+		for i, element in enumerate(self.elements):
+			stream.write(("[" if i == 0 else ", [") + dumps(element.name or element.id) + ", ")
+			element.writeJSON(stream)
+			stream.write("]")
+		stream.write("]}")
+		return stream
+
+	def toCompact( self ):
+		"""Returns the model in the compact format, as written by
+		`writeCompact`."""
+		return json.loads(self.writeCompact(io.StringIO()).getvalue())
+
+	def writeCompact( self, stream ):
+		"""Writes the model in the compact format, using the short keys
+		defined in `COMPACT_NAMES`. Elements are flattened in a list and
+		ids, names, types, tags and relation verbs are interned in a string
+		table. References are encoded as integers: positive integers
+		are indexes in the element list, negative integers `-(i+1)`
+		are indexes in the string table, and literal numbers are wrapped
+		as `{"v":number}`. Rows are streamed to the output as they are
+		encoded, the string table being written after them."""
+		c            = COMPACT_NAMES
+		strings      = []
+		string_index = {}
+		elements     = []
+		indexes      = {}
+		def intern( value ):
+			i = string_index.get(value)
+			if i is None:
+				i = string_index[value] = len(strings)
+				strings.append(value)
+			return i
+		def ref( value ):
+			if isinstance(value, Element):
+				i = indexes.get(id(value))
+				return intern(value.id) * -1 - 1 if i is None else i
+			elif isinstance(value, str):
+				return intern(value) * -1 - 1
+			elif isinstance(value, (int, float)) and not isinstance(value, bool):
+				return {"v":value}
+			else:
+				return value
+		# Elements are numbered in depth-first order, with a stack so that
+		# deep trees do not recurse.
+		stack = list(reversed(self.elements))
+		while stack:
+			element = stack.pop()
+			if id(element) not in indexes:
+				indexes[id(element)] = len(elements)
+				elements.append(element)
+				stack.extend(v for _, v in reversed(element.children or ()) if isinstance(v, Element))
+		write = stream.write
+		write('{"' + c["format"] + '":' + dumps(COMPACT_FORMAT) + ',"' + c["elements"] + '":[')
+		for i, e in enumerate(elements):
+			row = {}
+			if e.id:             row[c["id"]]             = intern(e.id)
+			if e.name:           row[c["name"]]           = intern(e.name)
+			if e.type:           row[c["type"]]           = intern(e.type)
+			if e.tags:           row[c["tags"]]           = [intern(_) for _ in e.tags]
+			if e.parent:         row[c["parent"]]         = ref(e.parent)
+			if e.documentation:  row[c["documentation"]]  = e.documentation
+			if e.representation: row[c["representation"]] = e.representation
+			if e.source:         row[c["source"]]         = intern(e.source)
+			if e.range:          row[c["range"]]          = e.range
+			if e.children:
+				row[c["children"]] = [[intern(n), ref(v)] for n, v in e.children]
+			relations = e.getRelations()
+			if relations:
+				row[c["relations"]] = [[intern(r[0])] + [ref(_) for _ in r[1:]] for r in relations]
+			if i: write(",")
+			write(dumps(row, separators=(",", ":")))
+		children = [[intern(_.name or _.id), indexes[id(_)]] for _ in self.elements]
+		write('],"' + c["children"] + '":' + dumps(children, separators=(",", ":")))
+		write(',"' + c["strings"] + '":' + dumps(strings, separators=(",", ":")) + "}")
+		return stream
+
+	def serialize( self, format="json" ):
+		"""Returns the model serialized in the given format (`json` or
+		`compact`), which can be given as the `data` of `write`, so that
+		writing several outputs only serializes the model once."""
+		with self.profile("serialize:" + format):
+			if format == "compact":
+				return self.writeCompact(io.StringIO()).getvalue()
+			else:
+				return self.writeJSON(io.StringIO()).getvalue()
+
+	def write( self, stream, format, search=None, data=None, kind=None ):
+		"""Writes the model to the given stream in the given format. The
+		optional `search` index (or its JSON) is embedded in the `html`
+		and `js` formats, along with the data of the given `kind` (`json`
+		or `compact`), defaulting to the `FORMATS_DATA` of the format.
+		When given, `data` is the result of `serialize` for that kind,
+		which is then written instead of serializing the model again."""
+		with self.profile("write:" + format):
+			return self._write(stream, format, search, data, kind or FORMATS_DATA[format])
+
+	def _write( self, stream, format, search=None, data=None, kind="json" ):
+		if format in ("json", "compact"):
+			self._writeData(stream, data, format)
 		elif format == "html":
-			with open(os.path.join(templates, "html-5.0.9.js")) as f: jsh  = f.read()
-			with open(os.path.join(templates, "smalldoc.js"))   as f: jss  = f.read()
-			with open(os.path.join(templates, "smalldoc.css"))  as f: css  = f.read()
-			with open(os.path.join(templates, "smalldoc.html")) as f: html = f.read()
-			data = json.dumps(self.toJSON())
-			html = html.replace('<link href="smalldoc.css" rel="stylesheet" />', "<style>" + css + "</style>")
-			html = html.replace(' src="html-5.0.9.js">', ">" + jsh)
-			html = html.replace(' src="smalldoc.js">',   ">" + jss + ";smalldoc.load('api.json');smalldoc.setup(" + data + ");")
-			stream.write(html)
+			# The data is streamed in between the prefix and suffix of the page
+			prefix, suffix = getShell("html")
+			stream.write(prefix)
+			if search:
+				stream.write("smalldoc.SEARCH=")
+				writeSearch(stream, search)
+				stream.write(";")
+			stream.write("smalldoc.load('api.json');smalldoc.setup(")
+			self._writeData(stream, data, kind)
+			stream.write(suffix)
 		elif format == "js":
-			js  = ""
-			js += "smalldoc.DATA=" + json.dumps(self.toJSON()) + ";"
-			with open(os.path.join(templates, "html-5.0.9.js")) as f: js += f.read()
-			with open(os.path.join(templates, "smalldoc.js"))   as f: js += f.read()
-			js += "smalldoc.loadCSS();smalldoc.load('api.json');smalldoc.setup();"
-			stream.write(js)
+			prefix, suffix = getShell("js")
+			stream.write(prefix)
+			self._writeData(stream, data, kind)
+			stream.write(";")
+			if search:
+				stream.write("smalldoc.SEARCH=")
+				writeSearch(stream, search)
+				stream.write(";")
+			stream.write(suffix)
+
+	def _writeData( self, stream, data=None, kind="json" ):
+		if data is not None:
+			stream.write(data)
+		elif kind == "compact":
+			self.writeCompact(stream)
+		else:
+			self.writeJSON(stream)
+		return stream
+
+	def writeSQLite( self, path ):
+		"""Writes the model to an SQLite database with indexed tables of
+		elements, tags, slots and relations, which can be queried with
+		`smalldoc.database.Database`."""
+		from smalldoc import database
+		with self.profile("write:sqlite", path):
+			return database.write(self, path)
+
+	def writeSplit( self, path, search=None ):
+		"""Writes the model as a directory with a small `manifest.json` that
+		lists the top-level elements (id, name, type, tags and the first
+		paragraph of their documentation) and one shard per top-level
+		element in `shards/`. The `index.html` viewer written alongside
+		only loads a shard when its element is first shown. The optional
+		`search` index is written as `manifest.search.json`."""
+		with self.profile("write:split", path):
+			return self._writeSplit(path, search)
+
+	def _writeSplit( self, path, search=None ):
+		shards = os.path.join(path, "shards")
+		if not os.path.exists(shards):
+			os.makedirs(shards)
+		children = []
+		for i, element in enumerate(self.elements):
+			name  = "{0}-{1}.json".format(i, RE_SHARD_NAME.sub("_", element.id or element.name or ""))
+			with open(os.path.join(shards, name), "w") as f:
+				element.writeJSON(f)
+			summary = RE_SUMMARY.search(element.documentation or "")
+			stub    = dict((k,v) for k,v in dict(
+				id            = element.id,
+				name          = element.name,
+				type          = element.type,
+				tags          = element.tags,
+				documentation = summary.group() if summary else None,
+				shard         = "shards/" + name,
+			).items() if v)
+			children.append([element.name or element.id, stub])
+		with open(os.path.join(path, "manifest.json"), "w") as f:
+			json.dump({"children":children}, f)
+		if search:
+			with open(os.path.join(path, "manifest.search.json"), "w") as f:
+				writeSearch(f, search)
+		with open(os.path.join(path, "index.html"), "w") as f:
+			f.write(getShell("split")[0])
+		return path
 
 # EOF - vim: ts=4 sw=4 noet
@@ -0,0 +1,158 @@
+#!/usr/bin/env python
+# encoding=utf8 ---------------------------------------------------------------
+# Project           : smalldoc
+# -----------------------------------------------------------------------------
+# Author            : FFunction
+# License           : BSD License
+# -----------------------------------------------------------------------------
+# Creation date     : 2016-12-22
+# Last modification : 2016-12-22
+# -----------------------------------------------------------------------------
+
+import time, heapq
+
+__doc__ = """
+Records the time spent and the number of calls in each stage of a build
+(parse, compile, render, unindent, write…), per stage and per input file.
+Drivers and documenters have a `profiler` attribute that, when set,
+is fed by their `profile` method.
+"""
+
+class Stage(object):
+	"""A context manager that records its duration in a profiler."""
+
+	__slots__ = ("profiler", "name", "path", "detail", "started")
+
+	def __init__( self, profiler, name, path=None, detail=None ):
+		self.profiler = profiler
+		self.name     = name
+		self.path     = path
+		self.detail   = detail
+		self.started  = None
+
+	def __enter__( self ):
+		if self.path:
+			self.profiler.context.append(self.path)
+		self.started = time.perf_counter()
+		return self
+
+	def __exit__( self, *args ):
+		duration = time.perf_counter() - self.started
+		if self.path:
+			self.profiler.context.pop()
+		self.profiler.record(self.name, duration, self.path, self.detail)
+		return False
+
+class NoStage(object):
+	"""The stage returned when there is no profiler: it records nothing."""
+
+	def __enter__( self ):
+		return self
+
+	def __exit__( self, *args ):
+		return False
+
+NO_STAGE = NoStage()
+
+class Profiler(object):
+	"""Aggregates the duration and count of stages, overall and per input
+	file, and keeps the `slowest` individual records. Records without a
+	path are attributed to the path of the innermost enclosing stage. The
+	`hooks` are invoked with `(stage, duration, path, detail)` for each
+	record."""
+
+	def __init__( self, slowest=20 ):
+		self.stages  = {}
+		self.files   = {}
+		self.slowest = slowest
+		self.records = []
+		self.hooks   = []
+		self.context = []
+		self._count  = 0
+
+	def stage( self, name, path=None, detail=None ):
+		"""Returns a context manager that records the time spent in its
+		block as the given stage."""
+		return Stage(self, name, path, detail)
+
+	def record( self, name, duration, path=None, detail=None ):
+		s = self.stages.get(name)
+		if s is None:
+			s = self.stages[name] = {"count":0, "total":0.0, "max":0.0}
+		s["count"] += 1
+		s["total"] += duration
+		s["max"]    = max(s["max"], duration)
+		path        = path or (self.context[-1] if self.context else None)
+		if path:
+			f = self.files.get(path)
+			if f is None:
+				f = self.files[path] = {"total":0.0, "stages":{}}
+			f["stages"][name] = f["stages"].get(name, 0.0) + duration
+			# Nested stages (like `render` within `parse`) are not counted
+			# twice in the file total.
+			if name.startswith("parse"):
+				f["total"] += duration
+		# We keep the N slowest records in a min-heap, the counter making
+		# sure records are never compared beyond their duration.
+		self._count += 1
+		item = (duration, self._count, name, path, detail)
+		if len(self.records) < self.slowest:
+			heapq.heappush(self.records, item)
+		elif duration > self.records[0][0]:
+			heapq.heapreplace(self.records, item)
+		for hook in self.hooks:
+			hook(name, duration, path, detail)
+		return duration
+
+	def merge( self, data ):
+		"""Merges the report (as returned by `toJSON`) of another profiler,
+		typically from a worker process."""
+		for name, s in data["stages"].items():
+			t = self.stages.setdefault(name, {"count":0, "total":0.0, "max":0.0})
+			t["count"] += s["count"]
+			t["total"] += s["total"]
+			t["max"]    = max(t["max"], s["max"])
+		for path, f in data["files"].items():
+			g = self.files.setdefault(path, {"total":0.0, "stages":{}})
+			g["total"] += f["total"]
+			for name, duration in f["stages"].items():
+				g["stages"][name] = g["stages"].get(name, 0.0) + duration
+		for r in data["slowest"]:
+			self._count += 1
+			item = (r["duration"], self._count, r["stage"], r.get("path"), r.get("detail"))
+			if len(self.records) < self.slowest:
+				heapq.heappush(self.records, item)
+			elif item[0] > self.records[0][0]:
+				heapq.heapreplace(self.records, item)
+		return self
+
+	def getSlowestFiles( self, count=10 ):
+		return sorted(self.files.items(), key=lambda _:-_[1]["total"])[:count]
+
+	def getSlowest( self ):
+		return [dict(duration=_[0], stage=_[2], path=_[3], detail=_[4]) for _ in sorted(self.records, reverse=True)]
+
+	def toJSON( self ):
+		return {
+			"stages"  : self.stages,
+			"files"   : self.files,
+			"slowest" : self.getSlowest(),
+		}
+
+	def summary( self, count=10 ):
+		"""Returns a human-readable summary of the report."""
+		lines = ["Stages:"]
+		for name, s in sorted(self.stages.items(), key=lambda _:-_[1]["total"]):
+			lines.append("  {0:24s} {1:10.3f}s {2:8d} calls {3:10.3f}s max".format(name, s["total"], s["count"], s["max"]))
+		if self.files:
+			lines.append("Slowest files:")
+			for path, f in self.getSlowestFiles(count):
+				lines.append("  {0:10.3f}s {1}".format(f["total"], path))
+		if self.records:
+			lines.append("Slowest items:")
+			for r in self.getSlowest()[:count]:
+				detail = (r["detail"] or "").strip().split("\n")[0][:60]
+				lines.append("  {0:10.3f}s {1:16s} {2} {3}".format(r["duration"], r["stage"], r["path"] or "", detail))
+		return "\n".join(lines)
+
+# EOF - vim: ts=4 sw=4 noet
@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+# encoding=utf8 ---------------------------------------------------------------
+# Project           : smalldoc
+# -----------------------------------------------------------------------------
+# Author            : FFunction
+# License           : BSD License
+# -----------------------------------------------------------------------------
+# Creation date     : 2016-12-22
+# Last modification : 2016-12-22
+# -----------------------------------------------------------------------------
+
+import re, json, bisect
+from   smalldoc.model import Element
+
+__doc__ = """
+Builds a prefix-searchable inverted index of the elements of a documenter,
+so that the viewer can search the documentation without scanning it.
+"""
+
+RE_TAG    = re.compile(r"<[^>]*>")
+RE_ENTITY = re.compile(r"&(\w+|#\d+);")
+RE_TOKEN  = re.compile(r"\w+", re.U)
+
+# Tokens shorter than this are not indexed
+TOKEN_MIN_LENGTH = 2
+
+def tokenize( text ):
+	"""Returns the lowercase tokens of the given text, from which HTML tags
+	and entities are stripped."""
+	if not text:
+		return []
+	text = RE_ENTITY.sub(" ", RE_TAG.sub(" ", text))
+	return [_ for _ in RE_TOKEN.findall(text.lower()) if len(_) >= TOKEN_MIN_LENGTH]
+
+class SearchIndex(object):
+	"""An inverted index mapping the tokens found in the names, ids, tags
+	and (stripped) documentation of elements to the elements. Tokens
+	are kept sorted, so that prefixes can be looked up with a binary
+	search.
+
+	The JSON representation is `{"d":[[id, name, type]…], "t":[token…],
+	"p":[[index…]…]}` where each posting list is sorted and delta-encoded."""
+
+	def __init__( self ):
+		self.documents = []
+		self.tokens    = []
+		self.postings  = []
+
+	def build( self, documenter ):
+		"""Indexes all the elements of the given documenter, in the order
+		in which they appear in the model."""
+		index    = {}
+		visited  = set()
+		stack    = list(reversed(documenter.elements))
+		while stack:
+			element = stack.pop()
+			if id(element) in visited:
+				continue
+			visited.add(id(element))
+			i = len(self.documents)
+			self.documents.append([element.id, element.name, element.type])
+			tokens = set(tokenize(element.name))
+			tokens.update(tokenize(element.id))
+			tokens.update(tokenize(" ".join(element.tags or ())))
+			tokens.update(tokenize(element.documentation))
+			for token in tokens:
+				index.setdefault(token, []).append(i)
+			stack.extend(v for _, v in reversed(element.children or ()) if isinstance(v, Element))
+		self.tokens   = sorted(index)
+		self.postings = [index[_] for _ in self.tokens]
+		return self
+
+	def lookup( self, prefix ):
+		"""Returns the set of document indexes which have a token starting
+		with the given prefix."""
+		prefix = prefix.lower()
+		res    = set()
+		i      = bisect.bisect_left(self.tokens, prefix)
+		while i < len(self.tokens) and self.tokens[i].startswith(prefix):
+			res.update(self.postings[i])
+			i += 1
+		return res
+
+	def search( self, query, limit=None ):
+		"""Returns the `[id, name, type]` of the documents matching all the
+		terms of the given query, each term being a prefix."""
+		res = None
+		for term in RE_TOKEN.findall(query.lower()):
+			matches = self.lookup(term)
+			res     = matches if res is None else res & matches
+		res = [self.documents[_] for _ in sorted(res or ())]
+		return res[:limit] if limit else res
+
+	def toJSON( self ):
+		postings = []
+		for p in self.postings:
+			postings.append([p[0]] + [p[i] - p[i - 1] for i in range(1, len(p))])
+		return {"d":self.documents, "t":self.tokens, "p":postings}
+
+	def write( self, stream ):
+		json.dump(self.toJSON(), stream, separators=(",", ":"))
+		return stream
+
+# EOF - vim: ts=4 sw=4 noet
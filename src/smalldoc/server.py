@@ -0,0 +1,268 @@
+#!/usr/bin/env python
+# encoding=utf8 ---------------------------------------------------------------
+# Project           : smalldoc
+# -----------------------------------------------------------------------------
+# Author            : FFunction
+# License           : BSD License
+# -----------------------------------------------------------------------------
+# Creation date     : 2016-12-22
+# Last modification : 2016-12-22
+# -----------------------------------------------------------------------------
+
+import json, threading
+from   http.server    import BaseHTTPRequestHandler, ThreadingHTTPServer
+from   urllib.parse   import urlparse, parse_qs, unquote
+from   smalldoc.model import Element
+from   smalldoc.search import SearchIndex
+
+__doc__ = """
+Serves a resident documentation model over a local HTTP/JSON API, so that
+tools can query it without paying for start-up, driver imports and
+parsing on each query. Requests are served concurrently, and the model
+can be updated in between them (see `main.watch`) by holding the
+server's write lock.
+
+The API is:
+
+- `GET /`: the status of the server, with the number of elements and the
+  `generation` of the model, incremented on each update.
+- `GET /elements`: the stubs of the top-level elements.
+- `GET /elements/<id>`: the given element, its children being stubs.
+- `GET /children/<id>`: the `[name, stub]` of the children of the given
+  element.
+- `GET /search?q=<query>&limit=<n>`: the `[id, name, type]` of the
+  elements matching the given query.
+- `GET /html/<id>`: an HTML fragment describing the given element.
+
+A stub is the `id`, `name`, `type` and `tags` of an element.
+"""
+
+class ReadWriteLock(object):
+	"""A lock that can be held by many readers or by a single writer.
+	Pending writers block new readers, so that updates are not starved
+	by a steady flow of requests."""
+
+	def __init__( self ):
+		self._condition = threading.Condition(threading.Lock())
+		self._readers   = 0
+		self._writers   = 0
+		self._writing   = False
+
+	def reading( self ):
+		return _Held(self._acquireRead, self._releaseRead)
+
+	def writing( self ):
+		return _Held(self._acquireWrite, self._releaseWrite)
+
+	def _acquireRead( self ):
+		with self._condition:
+			while self._writing or self._writers:
+				self._condition.wait()
+			self._readers += 1
+
+	def _releaseRead( self ):
+		with self._condition:
+			self._readers -= 1
+			if not self._readers:
+				self._condition.notify_all()
+
+	def _acquireWrite( self ):
+		with self._condition:
+			self._writers += 1
+			while self._writing or self._readers:
+				self._condition.wait()
+			self._writers -= 1
+			self._writing  = True
+
+	def _releaseWrite( self ):
+		with self._condition:
+			self._writing = False
+			self._condition.notify_all()
+
+class _Held(object):
+
+	__slots__ = ("acquire", "release")
+
+	def __init__( self, acquire, release ):
+		self.acquire = acquire
+		self.release = release
+
+	def __enter__( self ):
+		self.acquire()
+		return self
+
+	def __exit__( self, *args ):
+		self.release()
+		return False
+
+class Server(object):
+	"""Serves the given documenter on the given `(host, port)` address.
+	Updates to the documenter must be done within `lock.writing()`, and
+	followed by a call to `update`."""
+
+	def __init__( self, documenter, address=("127.0.0.1", 8642) ):
+		self.documenter = documenter
+		self.address    = address
+		self.lock       = ReadWriteLock()
+		self.generation = 0
+		self._search    = None
+		self._lock      = threading.Lock()
+		self._http      = None
+
+	def update( self ):
+		"""Notifies the server that the documenter changed."""
+		with self._lock:
+			self.generation += 1
+			self._search     = None
+		return self
+
+	def run( self ):
+		"""Serves requests until `stop` is called."""
+		self._http = ThreadingHTTPServer(self.address, RequestHandler)
+		self._http.daemon_threads = True
+		self._http.api            = self
+		try:
+			self._http.serve_forever()
+		finally:
+			self._http.server_close()
+
+	def stop( self ):
+		if self._http:
+			self._http.shutdown()
+
+	# =========================================================================
+	# API
+	# =========================================================================
+
+	def getStatus( self ):
+		return {"generation":self.generation, "elements":len(self.documenter.ids)}
+
+	def getElements( self ):
+		return [self.stub(_) for _ in self.documenter.elements]
+
+	def getElement( self, id ):
+		element = self.documenter.ids.get(id)
+		if element is None:
+			return None
+		return self._shallow(element) if element.children else element.toJSON()
+
+	def getChildren( self, id ):
+		element = self.documenter.ids.get(id)
+		if element is None:
+			return None
+		return [[name, self.stub(value) if isinstance(value, Element) else value] for name, value in element.children or ()]
+
+	def search( self, query, limit=None ):
+		return self.getSearchIndex().search(query, limit)
+
+	def getSearchIndex( self ):
+		"""Returns the search index of the current generation, which is
+		built on the first search after an update."""
+		with self._lock:
+			if self._search is None:
+				self._search = SearchIndex().build(self.documenter)
+			return self._search
+
+	def getHTML( self, id ):
+		element = self.documenter.ids.get(id)
+		if element is None:
+			return None
+		res = ["<div class='element' data-id='{0}' data-type='{1}'>".format(escape(element.id), escape(element.type or ""))]
+		res.append("<div class='name'>{0}</div>".format(escape(element.name or element.id)))
+		if element.representation:
+			res.append("<div class='representation'>{0}</div>".format(element.representation))
+		if element.documentation:
+			res.append("<div class='documentation'>{0}</div>".format(element.documentation))
+		if element.children:
+			res.append("<ul class='children'>")
+			for name, value in element.children:
+				if isinstance(value, Element):
+					res.append("<li class='{0}' data-id='{1}'>{2}</li>".format(escape(value.type or ""), escape(value.id or ""), escape(name)))
+			res.append("</ul>")
+		res.append("</div>")
+		return "".join(res)
+
+	def stub( self, element ):
+		return dict((k,v) for k,v in dict(
+			id   = element.id,
+			name = element.name,
+			type = element.type,
+			tags = element.tags,
+		).items() if v)
+
+	def _shallow( self, element ):
+		"""Returns the JSON of the given element, like `Element.toJSON`, but
+		with stubs for its children instead of their whole subtree."""
+		return dict((k,v) for k,v in dict(
+			id             = element.id,
+			name           = element.name,
+			type           = element.type,
+			tags           = element.tags,
+			parent         = element.parent.id if isinstance(element.parent, Element) else element.parent,
+			documentation  = element.documentation,
+			representation = element.representation,
+			source         = element.source,
+			range          = element.range,
+			children       = [(
+				_[0],
+				self.stub(_[1]) if isinstance(_[1], Element) else _[1],
+			) for _ in element.children or ()],
+			relations      = element._getRelationsJSON(),
+		).items() if v)
+
+class RequestHandler(BaseHTTPRequestHandler):
+	"""Dispatches the API requests to the `Server` bound as the `api` of
+	the HTTP server, holding its read lock while the documenter is
+	accessed."""
+
+	def do_GET( self ):
+		url    = urlparse(self.path)
+		query  = parse_qs(url.query)
+		path   = [unquote(_) for _ in url.path.split("/", 2)[1:]]
+		name   = path[0] if path else ""
+		arg    = path[1] if len(path) > 1 else None
+		server = self.server.api
+		html   = False
+		# The response is produced while holding the lock, but sent once
+		# it is released, so that slow clients do not delay updates.
+		try:
+			with server.lock.reading():
+				if name == "":
+					body = server.getStatus()
+				elif name == "elements" and arg is None:
+					body = server.getElements()
+				elif name == "elements":
+					body = server.getElement(arg)
+				elif name == "children":
+					body = server.getChildren(arg)
+				elif name == "search":
+					limit = query.get("limit")
+					body  = server.search((query.get("q") or [""])[0], int(limit[0]) if limit else None)
+				elif name == "html":
+					body, html = server.getHTML(arg), True
+				else:
+					body = None
+		except ValueError as e:
+			return self.send(400, str(e))
+		if body is None:
+			self.send(404, "Not found")
+		elif html:
+			self.send(200, body, "text/html; charset=utf-8")
+		else:
+			self.send(200, json.dumps(body), "application/json")
+
+	def send( self, status, body, contentType="text/plain; charset=utf-8" ):
+		data = body.encode("utf8")
+		self.send_response(status)
+		self.send_header("Content-Type",   contentType)
+		self.send_header("Content-Length", str(len(data)))
+		self.end_headers()
+		self.wfile.write(data)
+
+	def log_message( self, format, *args ):
+		pass
+
+def escape( text ):
+	return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;").replace("'", "&#39;")
+
+# EOF - vim: ts=4 sw=4 noet
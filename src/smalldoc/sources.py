@@ -0,0 +1,197 @@
+#!/usr/bin/env python
+# encoding=utf8 ---------------------------------------------------------------
+# Project           : smalldoc
+# -----------------------------------------------------------------------------
+# Author            : FFunction
+# License           : BSD License
+# -----------------------------------------------------------------------------
+# Creation date     : 2016-12-22
+# Last modification : 2016-12-22
+# -----------------------------------------------------------------------------
+
+import os, re, mmap, codecs, bisect, threading
+from   array       import array
+from   collections import OrderedDict
+
+__doc__ = """
+A store of source files shared by the drivers. Files are memory-mapped
+and indexed by line, and the store only keeps a bounded number of them
+open, evicting the least recently used ones.
+"""
+
+# Sources matching this are decoded instead of being read from the map
+RE_NOT_RAW = re.compile(b"[\x80-\xff\r]")
+RE_NEWLINE = re.compile("\r\n?")
+
+class Source(object):
+	"""A memory-mapped source file. Offsets are character offsets, as used
+	by the parsers: for ASCII files with Unix newlines (the common case)
+	they are byte offsets within the map, and other files are decoded once,
+	on first access, with the given `encoding`. Like files opened in text
+	mode, CRLF and CR newlines are read as LF, and offsets count them as
+	one character."""
+
+	__slots__ = ("path", "encoding", "stat", "data", "isRaw", "checked", "counted", "_text", "_lines")
+
+	def __init__( self, path, encoding="utf-8" ):
+		self.path     = path
+		self.encoding = encoding
+		self.checked  = 0
+		self.counted  = 0
+		self._text    = None
+		self._lines   = None
+		with open(path, "rb") as f:
+			s         = os.fstat(f.fileno())
+			self.stat = (s.st_mtime, s.st_size)
+			# Empty files cannot be mapped
+			self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if s.st_size else b""
+		self.isRaw    = RE_NOT_RAW.search(self.data) is None
+
+	@property
+	def size( self ):
+		"""The number of bytes held in memory (besides the map)."""
+		return len(self._text or "") + (len(self._lines) * self._lines.itemsize if self._lines else 0)
+
+	@property
+	def text( self ):
+		"""The decoded text of the source. For raw sources, this makes a
+		copy of the whole file, prefer `read` for extracts."""
+		if self.isRaw:
+			return self.data[:].decode("ascii")
+		if self._text is None:
+			self._text = RE_NEWLINE.sub("\n", self.data[:].decode(self.encoding))
+		return self._text
+
+	@property
+	def lines( self ):
+		"""The offsets at which each line starts."""
+		if self._lines is None:
+			lines = array("L", [0])
+			if self.isRaw:
+				i = self.data.find(b"\n")
+				while i != -1:
+					lines.append(i + 1)
+					i = self.data.find(b"\n", i + 1)
+			else:
+				text = self.text
+				i    = text.find("\n")
+				while i != -1:
+					lines.append(i + 1)
+					i = text.find("\n", i + 1)
+			self._lines = lines
+		return self._lines
+
+	def read( self, start=None, end=None ):
+		"""Returns the text between the given offsets. Raw sources are
+		decoded straight from a view of the map."""
+		if self.isRaw:
+			with memoryview(self.data) as view:
+				return str(view[start:end], "ascii")
+		else:
+			return self.text[start:end]
+
+	def getPosition( self, offset ):
+		"""Returns the `(line, column)` of the given offset, lines starting
+		at 1 and columns at 0."""
+		line = bisect.bisect_right(self.lines, offset)
+		return (line, offset - self.lines[line - 1])
+
+	def getOffset( self, line, column=0 ):
+		"""Returns the offset of the given line (starting at 1) and column."""
+		return self.lines[line - 1] + column
+
+	def isStale( self ):
+		try:
+			s = os.stat(self.path)
+		except OSError:
+			return True
+		return (s.st_mtime, s.st_size) != self.stat
+
+	def close( self ):
+		if isinstance(self.data, mmap.mmap):
+			self.data.close()
+		self.data   = b""
+		self._text  = None
+		self._lines = None
+
+class SourceStore(object):
+	"""Keeps at most `capacity` sources open and `limit` bytes of decoded
+	text and line indexes, closing the least recently used sources
+	first. Sources that changed on disk are reopened: they are checked
+	at most once per `refresh`, which is invoked before each parse."""
+
+	def __init__( self, capacity=256, limit=64 * 1024 * 1024 ):
+		self.capacity   = capacity
+		self.limit      = limit
+		self.sources    = OrderedDict()
+		self.generation = 0
+		self.total      = 0
+		self._lock      = threading.RLock()
+
+	def refresh( self ):
+		"""Makes the next access to each source check whether it changed on
+		disk."""
+		with self._lock:
+			self.generation += 1
+
+	def get( self, path, encoding=None ):
+		"""Returns the `Source` for the given path, decoded with the given
+		`encoding` or, by default, the one it was opened with (UTF-8 for
+		new sources)."""
+		encoding = codecs.lookup(encoding).name if encoding else None
+		with self._lock:
+			# The most recent source may have grown since it was returned
+			if self.sources:
+				self._count(next(reversed(self.sources.values())))
+			source = self.sources.get(path)
+			if source is not None and encoding and source.encoding != encoding:
+				self.evict(path)
+				source = None
+			if source is not None and source.checked != self.generation:
+				source.checked = self.generation
+				if source.isStale():
+					self.evict(path)
+					source = None
+			if source is None:
+				source = self.sources[path] = Source(path, encoding or "utf-8")
+				source.checked = self.generation
+			else:
+				self.sources.move_to_end(path)
+			self.trim()
+			return source
+
+	def read( self, path, start=None, end=None ):
+		with self._lock:
+			return self.get(path).read(start, end)
+
+	def evict( self, path ):
+		with self._lock:
+			source = self.sources.pop(path, None)
+			if source:
+				self.total -= source.counted
+				source.close()
+			return source
+
+	def trim( self ):
+		"""Evicts the least recently used sources until the store is within
+		its capacity and limit, always keeping the most recent one. Sizes
+		are counted when sources are accessed, as their decoded text and
+		line indexes are built lazily."""
+		with self._lock:
+			while len(self.sources) > 1 and (len(self.sources) > self.capacity or self.total > self.limit):
+				self.evict(next(iter(self.sources)))
+
+	def _count( self, source ):
+		size            = source.size
+		self.total     += size - source.counted
+		source.counted  = size
+
+	def clear( self ):
+		with self._lock:
+			for path in list(self.sources):
+				self.evict(path)
+
+# The store shared by all the drivers
+SOURCES = SourceStore()
+
+# EOF - vim: ts=4 sw=4 noet
@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+# encoding=utf8 ---------------------------------------------------------------
+# Project           : smalldoc
+# -----------------------------------------------------------------------------
+# Author            : FFunction
+# License           : BSD License
+# -----------------------------------------------------------------------------
+# Creation date     : 2016-12-22
+# Last modification : 2016-12-22
+# -----------------------------------------------------------------------------
+
+import os, time
+
+try:
+	import inotify_simple
+except ImportError as e:
+	inotify_simple = None
+
+__doc__ = """
+Watches a set of files for changes, using inotify when the `inotify_simple`
+module is available and polling the files otherwise.
+"""
+
+class Watcher(object):
+	"""Invokes `callback(paths)` with the set of watched paths that changed.
+	Changes happening within `delay` seconds of each other are reported
+	together, so that editors writing a file in several steps trigger a
+	single callback."""
+
+	def __init__( self, paths, callback, interval=0.5, delay=0.05 ):
+		self.paths     = [os.path.abspath(_) for _ in paths]
+		self.names     = dict((os.path.abspath(_), _) for _ in paths)
+		self.callback  = callback
+		self.interval  = interval
+		self.delay     = delay
+		self.isRunning = False
+
+	def run( self ):
+		"""Watches the files until `stop` is called."""
+		self.isRunning = True
+		if inotify_simple:
+			self._runINotify()
+		else:
+			self._runPolling()
+
+	def stop( self ):
+		self.isRunning = False
+
+	def _notify( self, paths ):
+		if paths:
+			self.callback(set(self.names[_] for _ in paths))
+
+	def _runINotify( self ):
+		flags    = inotify_simple.flags
+		mask     = flags.CLOSE_WRITE | flags.MOVED_TO | flags.CREATE
+		notifier = inotify_simple.INotify()
+		# We watch the parent directories, as editors often replace
+		# files instead of writing them in place.
+		watches  = {}
+		for path in self.paths:
+			parent = os.path.dirname(path)
+			if parent not in watches.values():
+				watches[notifier.add_watch(parent, mask)] = parent
+		try:
+			while self.isRunning:
+				events = notifier.read(timeout=int(self.interval * 1000))
+				if events:
+					events += notifier.read(timeout=int(self.delay * 1000))
+				changed = set(os.path.join(watches[_.wd], _.name) for _ in events if _.wd in watches)
+				self._notify([_ for _ in self.paths if _ in changed])
+		finally:
+			notifier.close()
+
+	def _runPolling( self ):
+		state = dict((_, self._stat(_)) for _ in self.paths)
+		while self.isRunning:
+			time.sleep(self.interval)
+			changed = []
+			for path in self.paths:
+				s = self._stat(path)
+				if s != state[path]:
+					state[path] = s
+					changed.append(path)
+			if changed:
+				time.sleep(self.delay)
+				for path in changed:
+					state[path] = self._stat(path)
+			self._notify(changed)
+
+	def _stat( self, path ):
+		try:
+			s = os.stat(path)
+			return (s.st_mtime, s.st_size)
+		except OSError:
+			return None
+
+# EOF - vim: ts=4 sw=4 noet